@@ -0,0 +1,39 @@
+"""add task summaries
+
+Revision ID: 0a6c4e2f8d31
+Revises: f3b8d20c6a15
+Create Date: 2025-01-29 16:03:48.205117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0a6c4e2f8d31'
+down_revision: Union[str, None] = 'f3b8d20c6a15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Compacted task history, one row per habit and month
+    op.create_table('task_summaries',
+        sa.Column('habit_id', sa.Integer(), nullable=False),
+        sa.Column('period_start', sa.DateTime(), nullable=False),
+        sa.Column('period_end', sa.DateTime(), nullable=False),
+        sa.Column('completed_count', sa.Integer(), nullable=False),
+        sa.Column('missed_count', sa.Integer(), nullable=False),
+        sa.Column('leading_streak', sa.Integer(), nullable=False),
+        sa.Column('trailing_streak', sa.Integer(), nullable=False),
+        sa.Column('longest_streak', sa.Integer(), nullable=False),
+        sa.Column('last_completed_end', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('habit_id', 'period_start')
+    )
+
+
+def downgrade() -> None:
+    # The compacted tasks are not restored
+    op.drop_table('task_summaries')
@@ -0,0 +1,30 @@
+"""add streak counters to habits
+
+Revision ID: 3f1c2a7d9b10
+Revises: 96af9b29c574
+Create Date: 2025-01-14 10:12:41.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '3f1c2a7d9b10'
+down_revision: Union[str, None] = '96af9b29c574'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('habits', sa.Column('current_streak', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('habits', sa.Column('longest_streak', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('habits', sa.Column('last_completed_period_end', sa.DateTime(), nullable=True))
+    # Existing habits start at 0, run `python client.py recompute-streaks` to rebuild them from tasks
+
+
+def downgrade() -> None:
+    op.drop_column('habits', 'last_completed_period_end')
+    op.drop_column('habits', 'longest_streak')
+    op.drop_column('habits', 'current_streak')
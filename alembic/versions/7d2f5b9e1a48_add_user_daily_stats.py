@@ -0,0 +1,45 @@
+"""add user daily stats
+
+Revision ID: 7d2f5b9e1a48
+Revises: 0a6c4e2f8d31
+Create Date: 2025-02-03 10:21:37.640912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '7d2f5b9e1a48'
+down_revision: Union[str, None] = '0a6c4e2f8d31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Per-user, per-day analytics rollups, filled by the first refresh
+    op.create_table('user_daily_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('completed_count', sa.Integer(), nullable=False),
+        sa.Column('missed_count', sa.Integer(), nullable=False),
+        sa.Column('active_habits', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+    op.create_table('rollup_watermarks',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('watermark', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # The tasks changed or expired since the watermark
+    op.create_index('ix_tasks_updated_at', 'tasks', ['updated_at'], unique=False)
+    op.create_index('ix_tasks_end_date', 'tasks', ['end_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_end_date', table_name='tasks')
+    op.drop_index('ix_tasks_updated_at', table_name='tasks')
+    op.drop_table('rollup_watermarks')
+    op.drop_table('user_daily_stats')
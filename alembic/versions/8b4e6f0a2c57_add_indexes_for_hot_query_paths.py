@@ -0,0 +1,32 @@
+"""add indexes for hot query paths
+
+Revision ID: 8b4e6f0a2c57
+Revises: 3f1c2a7d9b10
+Create Date: 2025-01-16 09:47:03.102775
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '8b4e6f0a2c57'
+down_revision: Union[str, None] = '3f1c2a7d9b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # habit.tasks loads and streak computations walk a habit's tasks in period order
+    op.create_index('ix_tasks_habit_id_start_date', 'tasks', ['habit_id', 'start_date'], unique=False)
+    # get_habits_struggled_most_last_period counts missed tasks of a habit within a date range
+    op.create_index('ix_tasks_habit_id_completed_end_date', 'tasks', ['habit_id', 'completed', 'end_date'], unique=False)
+    # get_user_habits_for_period, get_habit and user.habits filter habits by owner
+    op.create_index('ix_habits_user_id_periodicity', 'habits', ['user_id', 'periodicity'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_habits_user_id_periodicity', table_name='habits')
+    op.drop_index('ix_tasks_habit_id_completed_end_date', table_name='tasks')
+    op.drop_index('ix_tasks_habit_id_start_date', table_name='tasks')
@@ -0,0 +1,39 @@
+"""add leaderboard cache
+
+Revision ID: b91e4d7c3a20
+Revises: 7d2f5b9e1a48
+Create Date: 2025-02-05 18:42:09.118523
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b91e4d7c3a20'
+down_revision: Union[str, None] = '7d2f5b9e1a48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Top current streaks, built by the first leaderboard read
+    op.create_table('leaderboard_entries',
+        sa.Column('habit_id', sa.Integer(), nullable=False),
+        sa.Column('streak', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('habit_id')
+    )
+    op.create_table('leaderboard_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('floor_streak', sa.Integer(), nullable=False),
+        sa.Column('floor_habit_id', sa.Integer(), nullable=True),
+        sa.Column('built_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('leaderboard_state')
+    op.drop_table('leaderboard_entries')
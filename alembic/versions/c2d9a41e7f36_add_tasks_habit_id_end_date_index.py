@@ -0,0 +1,26 @@
+"""add tasks habit_id end_date index
+
+Revision ID: c2d9a41e7f36
+Revises: 8b4e6f0a2c57
+Create Date: 2025-01-20 08:31:55.640218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c2d9a41e7f36'
+down_revision: Union[str, None] = '8b4e6f0a2c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The scheduler looks for habits without a task ending after now
+    op.create_index('ix_tasks_habit_id_end_date', 'tasks', ['habit_id', 'end_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_habit_id_end_date', table_name='tasks')
@@ -0,0 +1,28 @@
+"""add timezone to users
+
+Revision ID: c4a8e2d61f07
+Revises: b91e4d7c3a20
+Create Date: 2025-02-09 10:17:44.305861
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c4a8e2d61f07'
+down_revision: Union[str, None] = 'b91e4d7c3a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing users keep following the host's timezone
+    op.add_column('users', sa.Column('timezone', sa.String(), nullable=True))
+    op.create_index('ix_users_timezone', 'users', ['timezone'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_timezone', table_name='users')
+    op.drop_column('users', 'timezone')
@@ -0,0 +1,28 @@
+"""cascade task deletes from habits
+
+Revision ID: e5a17c3b9d42
+Revises: c2d9a41e7f36
+Create Date: 2025-01-24 10:12:37.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e5a17c3b9d42'
+down_revision: Union[str, None] = 'c2d9a41e7f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Habit.tasks is write-only, so the ORM no longer loads the tasks to delete them with their habit
+    op.drop_constraint('tasks_habit_id_fkey', 'tasks', type_='foreignkey')
+    op.create_foreign_key('tasks_habit_id_fkey', 'tasks', 'habits', ['habit_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    op.drop_constraint('tasks_habit_id_fkey', 'tasks', type_='foreignkey')
+    op.create_foreign_key('tasks_habit_id_fkey', 'tasks', 'habits', ['habit_id'], ['id'])
@@ -0,0 +1,87 @@
+"""partition tasks by start_date
+
+Revision ID: f3b8d20c6a15
+Revises: e5a17c3b9d42
+Create Date: 2025-01-27 09:46:02.731954
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f3b8d20c6a15'
+down_revision: Union[str, None] = 'e5a17c3b9d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TASK_COLUMNS = 'id, description, start_date, end_date, updated_at, completed, completed_at, habit_id'
+# Partitions created ahead of the current month, the scheduler keeps creating them afterwards
+MONTHS_AHEAD = 3
+
+
+def create_tasks_table(partitioned: bool) -> None:
+    op.create_table('tasks',
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('tasks_id_seq')"), nullable=False),
+        sa.Column('description', sa.String(), nullable=False),
+        sa.Column('start_date', sa.DateTime(), nullable=False),
+        sa.Column('end_date', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('completed', sa.Boolean(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('habit_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], name='tasks_habit_id_fkey', ondelete='CASCADE'),
+        # The primary key of a partitioned table must include the partition key
+        sa.PrimaryKeyConstraint('id', 'start_date') if partitioned else sa.PrimaryKeyConstraint('id'),
+        **({'postgresql_partition_by': 'RANGE (start_date)'} if partitioned else {})
+    )
+
+
+def move_tasks_to_new_table(partitioned: bool) -> None:
+    """Rebuild tasks as a new table, keeping its rows, its id sequence and its indexes."""
+    op.execute("ALTER SEQUENCE tasks_id_seq OWNED BY NONE")
+    op.drop_index('ix_tasks_habit_id_end_date', table_name='tasks')
+    op.drop_index('ix_tasks_habit_id_completed_end_date', table_name='tasks')
+    op.drop_index('ix_tasks_habit_id_start_date', table_name='tasks')
+    op.rename_table('tasks', 'tasks_old')
+    op.execute("ALTER TABLE tasks_old RENAME CONSTRAINT tasks_pkey TO tasks_old_pkey")
+    op.execute("ALTER TABLE tasks_old RENAME CONSTRAINT tasks_habit_id_fkey TO tasks_old_habit_id_fkey")
+
+    create_tasks_table(partitioned)
+    if partitioned:
+        # One partition per month from the oldest task, rows outside of them go to the default partition
+        op.execute(f"""
+            DO $$
+            DECLARE month timestamp;
+            BEGIN
+                FOR month IN SELECT generate_series(
+                    date_trunc('month', COALESCE((SELECT MIN(start_date) FROM tasks_old), now())),
+                    date_trunc('month', now()) + interval '{MONTHS_AHEAD} months',
+                    interval '1 month'
+                ) LOOP
+                    EXECUTE format('CREATE TABLE %I PARTITION OF tasks FOR VALUES FROM (%L) TO (%L)',
+                                   'tasks_p' || to_char(month, 'YYYY_MM'), month, month + interval '1 month');
+                END LOOP;
+            END $$
+        """)
+        op.execute("CREATE TABLE tasks_default PARTITION OF tasks DEFAULT")
+
+    op.execute(f"INSERT INTO tasks ({TASK_COLUMNS}) SELECT {TASK_COLUMNS} FROM tasks_old")
+    op.drop_table('tasks_old')
+    op.execute("ALTER SEQUENCE tasks_id_seq OWNED BY tasks.id")
+
+    # Created on the partitioned table, the indexes are created on every partition
+    op.create_index('ix_tasks_habit_id_start_date', 'tasks', ['habit_id', 'start_date'], unique=False)
+    op.create_index('ix_tasks_habit_id_completed_end_date', 'tasks', ['habit_id', 'completed', 'end_date'], unique=False)
+    op.create_index('ix_tasks_habit_id_end_date', 'tasks', ['habit_id', 'end_date'], unique=False)
+
+
+def upgrade() -> None:
+    # Analytics filter tasks on a date range, monthly partitions let them scan only the months involved
+    move_tasks_to_new_table(partitioned=True)
+
+
+def downgrade() -> None:
+    # Partitions detached from tasks are left alone, their rows are not brought back
+    move_tasks_to_new_table(partitioned=False)
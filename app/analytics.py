@@ -1,39 +1,132 @@
-from .models import Task, Habit, User
-from .services.user_service import UserService
+from datetime import datetime, date, timedelta
+from .models import Task, Habit, User, UserDailyStats, task_runs_query
 from .services.habit_service import HabitService
-from .services.util import compute_start_and_end_date, get_last_interval_for_periodicity
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from .periods import previous_period
+from .services.util import PERIODICITIES
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy import func, select, case, and_, not_, literal, union_all
 
-def get_leaderboard(db: Session):
-    """Get the leaderboard based on the highest streaks. Returns only top 10 users."""
-    leaderboard = []
-    user_service = UserService(db)
-    users = user_service.get_all_users()
+def current_streaks_query(habit_ids: list = None):
+    """
+    Build a query of (habit_id, streak) computing every habit's current streak in the database,
+    optionally only for the given habits.
+    Tasks are numbered from the latest backwards and each task that was not completed starts a
+    new island, so the current streak is the size of the first island made only of completed tasks.
+    Compacted months take part as runs of tasks, see task_runs_query.
+    The task of the current period is skipped while it is still open, like Habit.get_current_streaks.
+    """
+    runs = task_runs_query(habit_ids).subquery()
+    ranked = select(
+        runs.c.habit_id,
+        runs.c.completed,
+        runs.c.end_date,
+        runs.c.length,
+        func.row_number().over(partition_by=runs.c.habit_id, order_by=(runs.c.start_date.desc(), runs.c.seq.desc())).label('position'),
+    ).subquery()
+
+    islands = (
+        select(
+            ranked.c.habit_id,
+            ranked.c.length,
+            func.sum(case((ranked.c.completed, 0), else_=1))
+            .over(partition_by=ranked.c.habit_id, order_by=ranked.c.position)
+            .label('breaks'),
+        )
+        .where(not_(and_(ranked.c.position == 1, not_(ranked.c.completed), ranked.c.end_date >= datetime.now())))
+        .subquery()
+    )
+
+    return (
+        select(islands.c.habit_id, func.sum(islands.c.length).label('streak'))
+        .where(islands.c.breaks == 0)
+        .group_by(islands.c.habit_id)
+    )
+
+def leaderboard_query(limit: int = 10):
+    """Build a query of (user name, habit name, current streak) for the top `limit` habits."""
+    streaks = current_streaks_query().subquery()
+    streak = func.coalesce(streaks.c.streak, 0)
+    return (
+        select(User.name, Habit.name, streak)
+        .select_from(User)
+        .join(Habit, Habit.user_id == User.id)
+        .outerjoin(streaks, streaks.c.habit_id == Habit.id)
+        .order_by(streak.desc(), Habit.id)
+        .limit(limit)
+    )
 
-    for user in users:
-        for habit in user.habits:
-            leaderboard.append((user.name, habit.name, habit.get_current_streaks()))
+def get_leaderboard(db: Session, limit: int = 10, vectorized: bool = False, cached: bool = False):
+    """
+    Get the leaderboard based on the highest current streaks, computed in a single query. Returns only the top `limit` entries.
+    With `vectorized`, the streaks are computed by the batch streak engine instead of the database.
+    With `cached`, they are read from the leaderboard cache of the stored streak counters, see app.leaderboard.
+    """
+    if vectorized:
+        return get_leaderboard_vectorized(db, limit)
+    if cached:
+        from .leaderboard import get_cached_leaderboard
+        leaderboard = get_cached_leaderboard(db, limit)
+        if leaderboard is not None:
+            return leaderboard
+    return [tuple(row) for row in db.execute(leaderboard_query(limit))]
 
-    # Sort by streak (highest streak first)
-    leaderboard.sort(key=lambda x: x[2], reverse=True)
+def get_leaderboard_vectorized(db: Session, limit: int = 10):
+    """Same as get_leaderboard, with the streaks of every habit computed in one pass by the streak engine."""
+    import numpy as np
+    from .streak_engine import load_streaks
 
-    # return only top 10 users
-    leaderboard = leaderboard[:10]
+    habit_ids = np.array(
+        db.scalars(select(Habit.id).where(Habit.user_id.isnot(None)).order_by(Habit.id)).all(), dtype=np.int64
+    )
+    streak_ids, current, _ = load_streaks(db)
+    # Habits without tasks have no streak
+    streaks = np.zeros(len(habit_ids), dtype=np.int64)
+    known = np.isin(streak_ids, habit_ids)
+    streaks[np.searchsorted(habit_ids, streak_ids[known])] = current[known]
+
+    # Highest streak first, ties by habit id like leaderboard_query
+    top = np.lexsort((habit_ids, -streaks))[:limit]
+    top_ids = [int(habit_id) for habit_id in habit_ids[top]]
+    names = {
+        habit_id: (user_name, habit_name)
+        for habit_id, user_name, habit_name in db.execute(
+            select(Habit.id, User.name, Habit.name).join(User, Habit.user_id == User.id).where(Habit.id.in_(top_ids))
+        )
+    }
+    return [(*names[habit_id], int(streak)) for habit_id, streak in zip(top_ids, streaks[top])]
 
-    return leaderboard
+def get_user_longest_streak(user: User, vectorized: bool = False):
+    if vectorized:
+        return get_user_longest_streak_vectorized(user)
 
-def get_user_longest_streak(user: User):
     longest_streak = 0
     habit_with_longest_streak = None
     for habit in user.habits:
-        current_streak = habit.get_longest_streaks()
+        current_streak = habit.longest_streak
         if current_streak >= longest_streak:
             longest_streak = current_streak
             habit_with_longest_streak = habit
 
     return habit_with_longest_streak, longest_streak
 
+def get_user_longest_streak_vectorized(user: User):
+    """Same as get_user_longest_streak, with the streaks computed from the tasks by the streak engine."""
+    import numpy as np
+    from .streak_engine import load_streaks
+
+    habits = user.habits
+    if not habits:
+        return None, 0
+    habit_ids = np.array([habit.id for habit in habits], dtype=np.int64)
+    streak_ids, _, longest = load_streaks(object_session(user), habit_ids.tolist())
+    streaks = np.zeros(len(habit_ids), dtype=np.int64)
+    positions = {habit_id: i for i, habit_id in enumerate(habit_ids.tolist())}
+    streaks[[positions[habit_id] for habit_id in streak_ids.tolist()]] = longest
+
+    # Like the loop above, the last habit wins ties
+    index = len(streaks) - 1 - int(np.argmax(streaks[::-1]))
+    return habits[index], int(streaks[index])
+
 def get_current_habits_for_period(db: Session, user_id: int, period: str):
     """Retrieve habits for the current period (daily/weekly/fortnightly/monthly/biannually/yearly)."""
     habit_service = HabitService(db)
@@ -46,29 +139,63 @@ def get_current_habits(db: Session, user_id: int):
     habits = habit_service.get_user_habits_for_period(user_id)
     return habits
 
-def get_habits_struggled_most_last_period(db: Session, user_id: int, period: str):
-    """
-    Retrieve habits that had the most missed tasks in the last period (daily/weekly/fortnightly/monthly/biannually/yearly).
-    """
-
-    # Compute the start and end date for the given period
-    start_date, end_date = compute_start_and_end_date(period.lower())
-    last_start_date, last_end_date = get_last_interval_for_periodicity(period, start_date, end_date)
+def missed_tasks_query(user_id: int, period: str, *columns, now: datetime = None):
+    """Build a query of (*columns, habit id, habit name, missed tasks) for the user's tasks missed in the last period."""
+    # The exact boundaries of the period before the current one
+    last_start_date, last_end_date = previous_period(period.lower(), now)
 
     # Query Tasks that fall within the calculated date range for the given period
-    missed_tasks_by_habit = (
-        db.query(Habit.id, Habit.name, func.count(Task.id).label('missed_tasks'))
+    return (
+        select(*columns, Habit.id, Habit.name, func.count(Task.id).label('missed_tasks'))
         .join(Task, Task.habit_id == Habit.id)
         # Only count missed tasks
-        .filter(
+        .where(
             Habit.user_id == user_id, Task.completed == False,
             Task.start_date >= last_start_date, Task.start_date <= last_end_date,
             Task.end_date <= last_end_date, Task.end_date >= last_start_date
         )
         .group_by(Habit.id, Habit.name)
-        .order_by(func.count(Task.id).desc())  # Sort by most missed tasks
-        .all()
     )
 
+def struggled_habits_query(user_id: int, period: str):
+    """Build a query of (habit id, habit name, missed tasks) for the user's tasks missed in the last period."""
+    return missed_tasks_query(user_id, period).order_by(func.count(Task.id).desc())  # Sort by most missed tasks
+
+def struggled_habits_all_periods_query(user_id: int):
+    """
+    Build a single query of (period, habit id, habit name, missed tasks) for the tasks missed in the last
+    interval of every periodicity, one UNION ALL branch per periodicity with its own window.
+    """
+    now = datetime.now()
+    missed = union_all(*[
+        missed_tasks_query(user_id, period, literal(period).label('period'), now=now) for period in PERIODICITIES
+    ]).subquery()
+    period_order = case({period: position for position, period in enumerate(PERIODICITIES)}, value=missed.c.period)
+    return select(missed).order_by(period_order, missed.c.missed_tasks.desc(), missed.c.id)
+
+def get_habits_struggled_most_last_period(db: Session, user_id: int, period: str):
+    """
+    Retrieve habits that had the most missed tasks in the last period (daily/weekly/fortnightly/monthly/biannually/yearly).
+    """
     # Return habits sorted by the number of missed tasks
-    return missed_tasks_by_habit
+    return db.execute(struggled_habits_query(user_id, period)).all()
+
+def get_habits_struggled_most_all_periods(db: Session, user_id: int):
+    """Retrieve the habits with missed tasks in the last interval of every periodicity, most missed first per period."""
+    return db.execute(struggled_habits_all_periods_query(user_id)).all()
+
+def user_activity_query(user_id: int, since: date):
+    """Build a query of the user's (day, completed, missed, active habits) rollups from `since`, read from the rollup table."""
+    return (
+        select(UserDailyStats.day, UserDailyStats.completed_count, UserDailyStats.missed_count, UserDailyStats.active_habits)
+        .where(UserDailyStats.user_id == user_id, UserDailyStats.day >= since)
+        .order_by(UserDailyStats.day)
+    )
+
+def get_user_activity(db: Session, user_id: int, days: int = 7):
+    """
+    Retrieve the user's completed and missed tasks and active habits per day over the last `days` days.
+    Read from the rollup maintained by app.rollups, so up to date as of its last refresh.
+    """
+    since = date.today() - timedelta(days=days - 1)
+    return db.execute(user_activity_query(user_id, since)).all()
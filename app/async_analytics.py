@@ -0,0 +1,58 @@
+import asyncio
+from datetime import date, timedelta
+from .models import Habit, User
+from .analytics import current_streaks_query, leaderboard_query, struggled_habits_query, struggled_habits_all_periods_query, user_activity_query
+from .database import get_async_sessionmaker
+from .services.async_habit_service import AsyncHabitService
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+async def get_leaderboard(db: AsyncSession, limit: int = 10):
+    """Get the leaderboard based on the highest current streaks, computed in a single query. Returns only the top `limit` entries."""
+    return [tuple(row) for row in await db.execute(leaderboard_query(limit))]
+
+async def get_user_longest_streak(db: AsyncSession, user: User):
+    """Get the user's habit with the longest streak and the streak."""
+    habit = await db.scalar(
+        select(Habit).where(Habit.user_id == user.id).order_by(Habit.longest_streak.desc(), Habit.id.desc()).limit(1)
+    )
+    return habit, habit.longest_streak if habit else 0
+
+async def get_current_habits_for_period(db: AsyncSession, user_id: int, period: str):
+    """Retrieve habits for the current period (daily/weekly/fortnightly/monthly/biannually/yearly)."""
+    habit_service = AsyncHabitService(db)
+    return await habit_service.get_user_habits_for_period(user_id, period)
+
+async def get_current_habits(db: AsyncSession, user_id: int):
+    """Retrieve habits for all periods."""
+    habit_service = AsyncHabitService(db)
+    return await habit_service.get_user_habits_for_period(user_id)
+
+async def get_habits_struggled_most_last_period(db: AsyncSession, user_id: int, period: str):
+    """
+    Retrieve habits that had the most missed tasks in the last period (daily/weekly/fortnightly/monthly/biannually/yearly).
+    """
+    return (await db.execute(struggled_habits_query(user_id, period))).all()
+
+async def get_habits_struggled_most_all_periods(db: AsyncSession, user_id: int):
+    """Retrieve the habits with missed tasks in the last interval of every periodicity, most missed first per period."""
+    return (await db.execute(struggled_habits_all_periods_query(user_id))).all()
+
+async def get_user_activity(db: AsyncSession, user_id: int, days: int = 7):
+    """Retrieve the user's completed and missed tasks and active habits per day over the last `days` days, from the rollup."""
+    since = date.today() - timedelta(days=days - 1)
+    return (await db.execute(user_activity_query(user_id, since))).all()
+
+async def get_current_streaks(habit_ids: list, sessionmaker=None) -> dict:
+    """
+    Compute the current streak of many habits from their tasks, one query per habit run concurrently.
+    Each query uses its own session, and so its own pooled connection, so they overlap in the database.
+    """
+    sessionmaker = sessionmaker or get_async_sessionmaker()
+
+    async def get_current_streak(habit_id: int):
+        async with sessionmaker() as db:
+            row = (await db.execute(current_streaks_query([habit_id]))).first()
+            return habit_id, row.streak if row else 0
+
+    return dict(await asyncio.gather(*(get_current_streak(habit_id) for habit_id in habit_ids)))
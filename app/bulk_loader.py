@@ -0,0 +1,137 @@
+"""
+Bulk seeding through Postgres COPY. Rows are generated lazily and streamed to the server, so
+millions of tasks load in minutes with bounded memory instead of one ORM object at a time.
+"""
+import csv
+import io
+import random
+from datetime import datetime, timedelta
+import bcrypt
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .leaderboard import invalidate_leaderboard
+from .partitions import create_task_partitions
+from .periods import period_bounds_array, period_indexes
+from .services.util import PERIODICITIES
+
+class RowStream(io.TextIOBase):
+    """Readable file-like object serializing rows to CSV as COPY consumes them."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._pending = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+def copy_rows(db: Session, table: str, columns: list, rows) -> None:
+    """Stream `rows` into `table` with COPY, inside the session's transaction. None is written as NULL."""
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    connection = db.connection().connection.dbapi_connection
+    with connection.cursor() as cursor:
+        if hasattr(cursor, 'copy_expert'):  # psycopg2
+            cursor.copy_expert(statement, RowStream(rows), size=1 << 16)
+        else:  # psycopg 3
+            stream = RowStream(rows)
+            with cursor.copy(statement) as copy:
+                while data := stream.read(1 << 16):
+                    copy.write(data)
+
+def reserve_ids(db: Session, table: str, count: int) -> int:
+    """Advance the id sequence of `table` past `count` new rows and return the first reserved id."""
+    last_id = db.scalar(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST("
+        f"(SELECT COALESCE(MAX(id), 0) FROM {table}), "
+        f"COALESCE(pg_sequence_last_value(pg_get_serial_sequence('{table}', 'id')::regclass), 0)) + :count)"
+    ), {'count': count})
+    return last_id - count + 1
+
+def generate_habit_tasks(periodicity: str, created_at: datetime, now: datetime, completion_rate: float, rng: random.Random):
+    """Generate (start_date, end_date, completed, completed_at) for every period from `created_at` to `now`."""
+    starts, ends = period_bounds_array(periodicity, period_indexes(periodicity, created_at, now))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        completed_at = None
+        if rng.random() < completion_rate:
+            completed_at = start + (min(end, now) - start) * rng.random()
+        yield start, end, completed_at is not None, completed_at
+
+def compute_habit_streaks(tasks, now: datetime):
+    """Current streak, longest streak and last completed period end of a task list, like Habit.recompute_streaks."""
+    streak = longest = 0
+    last_completed_end = None
+    for start, end, completed, _ in tasks:
+        if completed:
+            streak += 1
+            longest = max(longest, streak)
+            last_completed_end = end
+        elif end >= now:
+            continue  # The open period of the current task does not break the streak
+        else:
+            streak = 0
+    return streak, longest, last_completed_end
+
+def seed_bulk(db: Session, users: int, habits_per_user: int, days: int, completion_rate: float = 0.7,
+              password: str = "Password1@234", seed: int = 0) -> dict:
+    """
+    Seed `users` users with `habits_per_user` habits each and `days` days of task history through COPY.
+    Every user gets the same precomputed password hash. Returns the number of rows created per table.
+    """
+    now = datetime.now()
+    created_at = now - timedelta(days=days)
+    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    habits_count = users * habits_per_user
+    first_user_id = reserve_ids(db, 'users', users)
+    first_habit_id = reserve_ids(db, 'habits', habits_count)
+
+    def habit_tasks(habit_id: int):
+        # Seeded per habit so the history can be generated again, once for the habit row and once for its tasks
+        periodicity = PERIODICITIES[(habit_id - first_habit_id) % len(PERIODICITIES)]
+        rng = random.Random(seed * 1_000_003 + habit_id)
+        return generate_habit_tasks(periodicity, created_at, now, completion_rate, rng)
+
+    def habit_rows():
+        for i in range(habits_count):
+            habit_id = first_habit_id + i
+            current, longest, last_completed_end = compute_habit_streaks(habit_tasks(habit_id), now)
+            yield (habit_id, f"Habit {i % habits_per_user + 1}", PERIODICITIES[i % len(PERIODICITIES)],
+                   first_user_id + i // habits_per_user, created_at, now, current, longest, last_completed_end)
+
+    tasks_count = 0
+
+    def task_rows():
+        nonlocal tasks_count
+        for i in range(habits_count):
+            habit_id = first_habit_id + i
+            for number, (start, end, completed, completed_at) in enumerate(habit_tasks(habit_id), 1):
+                tasks_count += 1
+                yield f"Habit {i % habits_per_user + 1} task {number}", start, end, now, completed, completed_at, habit_id
+
+    # Yearly periods start on January 1st, the earliest a task can start
+    create_task_partitions(db, datetime(created_at.year, 1, 1), now)
+    copy_rows(db, 'users', ['id', 'name', 'email', 'password_hash', 'created_at', 'updated_at'], (
+        (user_id, f"User {user_id}", f"user{user_id}@example.com", password_hash, created_at, now)
+        for user_id in range(first_user_id, first_user_id + users)
+    ))
+    copy_rows(db, 'habits', ['id', 'name', 'periodicity', 'user_id', 'created_at', 'updated_at',
+                             'current_streak', 'longest_streak', 'last_completed_period_end'], habit_rows())
+    copy_rows(db, 'tasks', ['description', 'start_date', 'end_date', 'updated_at', 'completed', 'completed_at', 'habit_id'],
+              task_rows())
+    invalidate_leaderboard(db)
+    db.commit()
+    return {'users': users, 'habits': habits_count, 'tasks': tasks_count}
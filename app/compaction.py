@@ -0,0 +1,65 @@
+"""
+Compaction of old task history. The tasks of every habit and month older than the horizon are rolled
+into a TaskSummary row and deleted; streaks and listings read the summaries with the recent raw tasks.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .partitions import month_start
+
+# Tasks are numbered per habit and month, each missed task starts a new run of completed ones: run 0 is
+# the leading run, the last run the trailing one. Months compacted again are appended to their summary.
+COMPACT_TASKS = text("""
+    WITH compacted AS (
+        DELETE FROM tasks WHERE start_date < :before AND end_date < :now
+        RETURNING id, habit_id, start_date, end_date, COALESCE(completed, false) AS completed
+    ), numbered AS (
+        SELECT habit_id, date_trunc('month', start_date) AS period_start, end_date, completed,
+               SUM(CASE WHEN completed THEN 0 ELSE 1 END) OVER (
+                   PARTITION BY habit_id, date_trunc('month', start_date) ORDER BY start_date, id
+               ) AS run
+        FROM compacted
+    ), runs AS (
+        SELECT habit_id, period_start, run, COUNT(*) FILTER (WHERE completed) AS length,
+               MAX(end_date) AS period_end, MAX(end_date) FILTER (WHERE completed) AS last_completed_end
+        FROM numbered
+        GROUP BY habit_id, period_start, run
+    ), inserted AS (
+        INSERT INTO task_summaries (habit_id, period_start, period_end, completed_count, missed_count,
+                                    leading_streak, trailing_streak, longest_streak, last_completed_end)
+        SELECT habit_id, period_start, MAX(period_end), SUM(length), MAX(run),
+               COALESCE(MAX(length) FILTER (WHERE run = 0), 0), (ARRAY_AGG(length ORDER BY run DESC))[1],
+               MAX(length), MAX(last_completed_end)
+        FROM runs
+        GROUP BY habit_id, period_start
+        ON CONFLICT (habit_id, period_start) DO UPDATE SET
+            period_end = GREATEST(task_summaries.period_end, EXCLUDED.period_end),
+            completed_count = task_summaries.completed_count + EXCLUDED.completed_count,
+            missed_count = task_summaries.missed_count + EXCLUDED.missed_count,
+            leading_streak = CASE WHEN task_summaries.missed_count = 0
+                                  THEN task_summaries.completed_count + EXCLUDED.leading_streak
+                                  ELSE task_summaries.leading_streak END,
+            trailing_streak = CASE WHEN EXCLUDED.missed_count = 0
+                                   THEN task_summaries.trailing_streak + EXCLUDED.completed_count
+                                   ELSE EXCLUDED.trailing_streak END,
+            longest_streak = GREATEST(task_summaries.longest_streak, EXCLUDED.longest_streak,
+                                      task_summaries.trailing_streak + EXCLUDED.leading_streak),
+            last_completed_end = GREATEST(task_summaries.last_completed_end, EXCLUDED.last_completed_end)
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM compacted), (SELECT COUNT(*) FROM inserted)
+""")
+
+def compaction_boundary(horizon_days: int, now: datetime = None) -> datetime:
+    """First day of the month containing `now - horizon_days`, only whole months before it are compacted."""
+    return month_start((now or datetime.now()) - timedelta(days=horizon_days))
+
+def compact_tasks(db: Session, horizon_days: int, now: datetime = None) -> tuple:
+    """
+    Roll the tasks of the months older than `horizon_days` into per-habit monthly summaries and delete them,
+    in a single statement. Returns the number of tasks compacted and of summaries written.
+    """
+    now = now or datetime.now()
+    tasks, summaries = db.execute(COMPACT_TASKS, {'before': compaction_boundary(horizon_days, now), 'now': now}).one()
+    db.commit()
+    return tasks, summaries
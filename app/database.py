@@ -1,11 +1,65 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from .config import config
 
-engine = create_engine(config.DATABASE_URL, echo=config.DEBUG)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def create_db_engine(pool_size: int = None, max_overflow: int = None):
+    """Create the engine from the connection pool profile of the current config."""
+    return create_engine(config.DATABASE_URL, **config.engine_options(pool_size, max_overflow))
+
+class LazySessionmaker(sessionmaker):
+    """A sessionmaker that creates the engine when the first session is opened, not at import time."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get('bind') is None and 'bind' not in local_kw:
+            get_engine()
+        return super().__call__(**local_kw)
+
+_engine = None
+SessionLocal = LazySessionmaker(autocommit=False, autoflush=False)
+
+def get_engine():
+    """Get the engine, creating it from the current config on first use."""
+    global _engine
+    if _engine is None:
+        _engine = create_db_engine()
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+def __getattr__(name: str):
+    # Keep `from app.database import engine` working without creating the engine on import
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def configure_engine(pool_size: int, max_overflow: int = 0):
+    """Replace the engine with one whose pool is sized for the concurrency of the calling process."""
+    global _engine
+    if _engine is not None:
+        _engine.dispose()
+    _engine = create_db_engine(pool_size, max_overflow)
+    SessionLocal.configure(bind=_engine)
+    return _engine
+
+_async_sessionmaker = None
+
+def get_async_sessionmaker():
+    """Get the AsyncSession factory, creating the async psycopg engine on first use."""
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        url = make_url(config.DATABASE_URL).set(drivername='postgresql+psycopg')
+        async_engine = create_async_engine(url, **config.engine_options(config.ASYNC_POOL_SIZE, 0, url=url))
+        _async_sessionmaker = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
 
 def init_db():
-    """Initialize the database and create tables."""
+    """Initialize the database, create tables and the partitions of the current months."""
     from app import models
-    models.Base.metadata.create_all(bind=engine)
+    from app.partitions import create_future_task_partitions
+    models.Base.metadata.create_all(bind=get_engine())
+    db = SessionLocal()
+    try:
+        create_future_task_partitions(db, config.TASK_PARTITION_MONTHS_AHEAD)
+    finally:
+        db.close()
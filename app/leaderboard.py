@@ -0,0 +1,134 @@
+"""
+Cache of the top current streaks, so the leaderboard is read from a few rows instead of ranking every habit.
+Habits rank by streak, highest first, then by id. Every habit outside of the cache ranks at or after its floor,
+so streak changes update the cache in place: a habit that now ranks before the floor enters it and the habits
+pushed out of it lower the floor. The cache is rebuilt from the stored streak counters when it is missing,
+or when a habit outside of it could rank among the entries read. Writers adding entries lock the state row
+first, so they take turns moving the floor. Completions compare with the floor under a key share lock, which
+doesn't block these writers but makes a rebuild wait for their streaks to be committed.
+"""
+from datetime import datetime
+from sqlalchemy import select, insert, update, delete, text
+from sqlalchemy.orm import Session
+from .config import config
+from .models import Habit, User, LeaderboardEntry, LeaderboardState
+
+STATE_ID = 1
+
+def rank_key(streak: int, habit_id: int) -> tuple:
+    """Sort key of a habit in the leaderboard, lower ranks first."""
+    return -streak, habit_id or 0
+
+def get_floor(db: Session, for_update: bool = False):
+    """
+    The (streak, habit id) floor of the cache, None when there is no cache. `for_update` locks the state row
+    until the end of the transaction, for writers about to change the entries or the floor.
+    """
+    query = select(LeaderboardState.floor_streak, LeaderboardState.floor_habit_id).where(LeaderboardState.id == STATE_ID)
+    row = db.execute(query.with_for_update(key_share=True) if for_update else query).first()
+    return tuple(row) if row else None
+
+def set_floor(db: Session, floor: tuple):
+    """Store the (streak, habit id) floor of the cache."""
+    db.execute(update(LeaderboardState).where(LeaderboardState.id == STATE_ID)
+               .values(floor_streak=floor[0], floor_habit_id=floor[1]))
+
+def rebuild_leaderboard(db: Session, size: int = None):
+    """Rebuild the cache with the top `size` streaks from the habits' stored streak counters, and commit."""
+    size = size or config.LEADERBOARD_CACHE_SIZE
+    # There may be no state row to lock yet: the table lock waits for the writers and completions in progress,
+    # so the streaks read include theirs, and makes the next ones wait for the rebuilt cache
+    db.execute(text("LOCK TABLE leaderboard_state IN EXCLUSIVE MODE"))
+    top = db.execute(
+        select(Habit.id, Habit.current_streak)
+        .where(Habit.user_id.isnot(None))
+        .order_by(Habit.current_streak.desc(), Habit.id)
+        .limit(size + 1)
+    ).all()
+    entries, outside = top[:size], top[size:]
+    floor = (outside[0].current_streak, outside[0].id) if outside else (-1, None)
+
+    db.execute(delete(LeaderboardEntry))
+    if entries:
+        db.execute(insert(LeaderboardEntry), [{'habit_id': habit_id, 'streak': streak} for habit_id, streak in entries])
+    db.execute(delete(LeaderboardState))
+    db.execute(insert(LeaderboardState).values(
+        id=STATE_ID, floor_streak=floor[0], floor_habit_id=floor[1], built_at=datetime.now(),
+    ))
+    db.commit()
+
+def invalidate_leaderboard(db: Session):
+    """Drop the cache after streak counters were changed in bulk, the next read rebuilds it."""
+    db.execute(delete(LeaderboardState))
+
+def update_entry(db: Session, habit_id: int, streak: int) -> bool:
+    """Set the streak of the habit's entry, False if the habit is not in the cache."""
+    return db.execute(
+        update(LeaderboardEntry).where(LeaderboardEntry.habit_id == habit_id).values(streak=streak)
+    ).rowcount > 0
+
+def update_leaderboard(db: Session, habit_id: int, streak: int, size: int = None):
+    """Record the new current streak of a habit in the cache, in the caller's transaction."""
+    if get_floor(db) is None:
+        return  # No cache to keep up to date
+    if update_entry(db, habit_id, streak):
+        return  # Moving an entry within the cache leaves the floor as is
+
+    # Entering the cache moves the floor: lock it, then check again as a concurrent writer may have added the habit
+    floor = get_floor(db, for_update=True)
+    if floor is None or update_entry(db, habit_id, streak) or rank_key(streak, habit_id) >= rank_key(*floor):
+        return
+
+    # The habit now ranks before every habit outside of the cache, it enters it and pushes the last entry out
+    db.execute(insert(LeaderboardEntry).values(habit_id=habit_id, streak=streak))
+    size = size or config.LEADERBOARD_CACHE_SIZE
+    beyond = (
+        select(LeaderboardEntry.habit_id)
+        .order_by(LeaderboardEntry.streak.desc(), LeaderboardEntry.habit_id)
+        .offset(size)
+    )
+    evicted = db.execute(
+        delete(LeaderboardEntry).where(LeaderboardEntry.habit_id.in_(beyond))
+        .returning(LeaderboardEntry.streak, LeaderboardEntry.habit_id)
+    ).all()
+    if evicted:
+        set_floor(db, min([floor, *map(tuple, evicted)], key=lambda key: rank_key(*key)))
+
+def reset_leaderboard_streaks(db: Session, habit_ids: list):
+    """Record that the current streak of the habits was reset, lowering streaks keeps the floor valid."""
+    if habit_ids:
+        db.execute(update(LeaderboardEntry).where(LeaderboardEntry.habit_id.in_(habit_ids)).values(streak=0))
+
+def entries_query(limit: int):
+    """Build a query of the top `limit` cached entries as (user name, habit name, streak, habit id)."""
+    return (
+        select(User.name, Habit.name, LeaderboardEntry.streak, Habit.id)
+        .select_from(LeaderboardEntry)
+        .join(Habit, Habit.id == LeaderboardEntry.habit_id)
+        .join(User, Habit.user_id == User.id)
+        .order_by(LeaderboardEntry.streak.desc(), LeaderboardEntry.habit_id)
+        .limit(limit)
+    )
+
+def read_leaderboard_entries(db: Session, limit: int):
+    """The top `limit` cached entries, None if there is no cache or a habit outside of it could rank among them."""
+    floor = get_floor(db)
+    if floor is None:
+        return None
+    rows = db.execute(entries_query(limit)).all()
+    if len(rows) < limit:
+        return rows if floor[0] == -1 else None
+    return rows if rank_key(rows[-1][2], rows[-1][3]) < rank_key(*floor) else None
+
+def get_cached_leaderboard(db: Session, limit: int = 10):
+    """
+    Get the top `limit` (user name, habit name, current streak) from the cache, rebuilding it first when it is
+    missing or cannot answer. Returns None when it still cannot, as when `limit` is larger than the cache.
+    """
+    if limit > config.LEADERBOARD_CACHE_SIZE:
+        return None
+    rows = read_leaderboard_entries(db, limit)
+    if rows is None:
+        rebuild_leaderboard(db)
+        rows = read_leaderboard_entries(db, limit)
+    return None if rows is None else [tuple(row[:3]) for row in rows]
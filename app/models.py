@@ -1,13 +1,20 @@
 from datetime import datetime
 import bcrypt
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, types, func
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Index, types, func, select, literal, case, union_all
+from sqlalchemy.orm import relationship, object_session
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+def hash_password(password: str) -> str:
+    """Hash a password with bcrypt. Module level so it can run in a process pool."""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
 class User(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        Index('ix_users_timezone', 'timezone'),  # users of a rollover bucket
+    )
 
     id = Column(Integer, primary_key=True)
     created_at = Column(types.DateTime, nullable=False, default=func.now())
@@ -15,12 +22,13 @@ class User(Base):
     name = Column(String, nullable=False) 
     email = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)  # Store hashed password
+    timezone = Column(String, nullable=True)  # IANA timezone name, the host's timezone if not set
 
     habits = relationship('Habit', back_populates='user', cascade='all, delete-orphan')
 
     def set_password(self, password: str):
         """Hash the password and store it in the password_hash field."""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
         """Check if the provided password matches the stored hash."""
@@ -34,18 +42,29 @@ class User(Base):
 
 class Task(Base):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        Index('ix_tasks_habit_id_start_date', 'habit_id', 'start_date'),  # habit.tasks, streaks
+        Index('ix_tasks_habit_id_completed_end_date', 'habit_id', 'completed', 'end_date'),  # missed tasks per period
+        Index('ix_tasks_habit_id_end_date', 'habit_id', 'end_date'),  # habits due for a new task
+        Index('ix_tasks_updated_at', 'updated_at'),  # tasks changed since the rollup watermark
+        Index('ix_tasks_end_date', 'end_date'),  # tasks that expired since the rollup watermark
+        {'postgresql_partition_by': 'RANGE (start_date)'},  # Monthly partitions, see app/partitions.py
+    )
 
-    id = Column(Integer, primary_key=True)
+    # The partition key is part of the table's primary key, tasks are still identified by id alone
+    id = Column(Integer, primary_key=True, autoincrement=True)
     description = Column(String, nullable=False)
-    start_date = Column(types.DateTime, nullable=False, default=func.now())
+    start_date = Column(types.DateTime, primary_key=True, nullable=False, default=func.now())
     end_date = Column(types.DateTime, nullable=False) # Deadline for the task
     updated_at = Column(types.DateTime, nullable=False, default=func.now(), onupdate=func.now())
     completed = Column(Boolean, default=False)
     completed_at = Column(types.DateTime, nullable=True)  # Timestamp for when the task was completed
-    habit_id = Column(Integer, ForeignKey('habits.id'))
+    habit_id = Column(Integer, ForeignKey('habits.id', ondelete='CASCADE'))
 
     habit = relationship('Habit', back_populates='tasks')
 
+    __mapper_args__ = {'primary_key': [id]}
+
     def complete(self):
         """Mark task as completed and set the completion timestamp."""
         now = datetime.now()
@@ -53,9 +72,14 @@ class Task(Base):
             raise ValueError("Task is overdue and cannot be completed.")
         self.completed = True
         self.completed_at = now
+        if self.habit is not None:
+            self.habit.record_completion(self)
 
 class Habit(Base):
     __tablename__ = 'habits'
+    __table_args__ = (
+        Index('ix_habits_user_id_periodicity', 'user_id', 'periodicity'),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
@@ -63,40 +87,192 @@ class Habit(Base):
     updated_at = Column(types.DateTime, nullable=False, default=func.now(), onupdate=func.now())
     periodicity = Column(String, nullable=False)  # daily, weekly, etc.
     user_id = Column(Integer, ForeignKey('users.id'))
+    # Streak counters maintained as tasks are completed and periods roll over
+    current_streak = Column(Integer, nullable=False, default=0, server_default='0')
+    longest_streak = Column(Integer, nullable=False, default=0, server_default='0')
+    last_completed_period_end = Column(types.DateTime, nullable=True)  # end_date of the last completed task
 
     user = relationship('User', back_populates='habits')
-    tasks = relationship('Task', back_populates='habit', cascade='all, delete-orphan')
+    # Write-only: a habit can have years of tasks, so they are queried in slices instead of loaded whole.
+    # Tasks are removed by the database when their habit is deleted.
+    tasks = relationship('Task', back_populates='habit', cascade='all, delete-orphan', lazy='write_only',
+                         passive_deletes=True, order_by=(Task.start_date, Task.id))
+
+    def _session(self):
+        """The session of the habit, flushed so that queries see tasks added to it."""
+        session = object_session(self)
+        session.flush()
+        return session
+
+    def _task_history(self, descending: bool = False):
+        """Stream the (completed, end_date, length) runs of the habit's history in period order, a batch at a time."""
+        runs = task_runs_query([self.id]).subquery()
+        order = (runs.c.start_date.desc(), runs.c.seq.desc()) if descending else (runs.c.start_date, runs.c.seq)
+        query = select(runs.c.completed, runs.c.end_date, runs.c.length).order_by(*order)
+        return self._session().execute(query.execution_options(yield_per=1000))
 
     def get_current_streaks(self) -> int:
-        """Dynamically compute the streak based on task completion."""
+        """Dynamically compute the streak based on task completion, reading back from the latest task."""
         streak = 0
-        for task in reversed(self.tasks):
-            if task.completed:
-                streak += 1
-            else:
-                break
+        with self._task_history(descending=True) as runs:
+            for index, (completed, end_date, length) in enumerate(runs):
+                # The task of the current period does not break the streak until it is overdue
+                if index == 0 and not completed and end_date >= datetime.now():
+                    continue
+                if not completed:
+                    break
+                streak += length
         return streak
     
     def get_longest_streaks(self) -> int:
-        """Dynamically compute the streak based on task completion."""
+        """Dynamically compute the longest streak based on task completion."""
         streak = 0
         longest_streak = 0
-        for task in reversed(self.tasks):
-            if task.completed:
-                streak += 1
-            else:
-                if streak > longest_streak:
-                    longest_streak = streak
-
-                streak = 0
-        return streak
+        with self._task_history() as runs:
+            for completed, _, length in runs:
+                if completed:
+                    streak += length
+                    longest_streak = max(longest_streak, streak)
+                else:
+                    streak = 0
+        return longest_streak
+
+    def recompute_streaks(self):
+        """Rebuild the stored streak counters from the task history."""
+        self.current_streak = self.get_current_streaks()
+        self.longest_streak = self.get_longest_streaks()
+        self.last_completed_period_end = self._session().scalar(select(func.greatest(
+            select(func.max(Task.end_date)).where(Task.habit_id == self.id, Task.completed == True).scalar_subquery(),
+            select(func.max(TaskSummary.last_completed_end)).where(TaskSummary.habit_id == self.id).scalar_subquery(),
+        )))
+
+    def record_completion(self, task: 'Task'):
+        """Update the stored streak counters after a task of this habit has been completed."""
+        if self.last_completed_period_end is not None and task.end_date <= self.last_completed_period_end:
+            # An older period was completed out of order, it may join two runs
+            self.recompute_streaks()
+            return
+        self.current_streak = (self.current_streak or 0) + 1
+        self.longest_streak = max(self.longest_streak or 0, self.current_streak)
+        self.last_completed_period_end = task.end_date
+
+    def record_rollover(self, task: 'Task'):
+        """Reset the current streak if the task of the period that just ended was not completed."""
+        if task is not None and not task.completed:
+            self.current_streak = 0
 
     def add_task(self, description: str, start_date: datetime, end_date: datetime = None):
         """Add a new task to the habit."""
         task = Task(description=description, completed=False, end_date=end_date, start_date=start_date)
-        self.tasks.append(task)
+        self.tasks.add(task)
         return task
 
-    def get_tasks(self):
-        """Get all tasks associated with the habit."""
-        return self.tasks
+    def count_tasks(self) -> int:
+        """Count the tasks of the habit without loading them, compacted ones included."""
+        return self._session().scalar(select(tasks_count_query(Habit.id)).where(Habit.id == self.id))
+
+    def get_latest_task(self):
+        """Get the task of the latest period, None if the habit has no task."""
+        tasks = self.get_tasks(1)
+        return tasks[0] if tasks else None
+
+    def get_tasks(self, limit: int = None):
+        """Get the tasks associated with the habit in period order, only the last `limit` ones if given."""
+        if limit is None:
+            return self._session().scalars(self.tasks.select()).all()
+        latest = self.tasks.select().order_by(None).order_by(Task.start_date.desc(), Task.id.desc()).limit(limit)
+        return list(reversed(self._session().scalars(latest).all()))
+
+class TaskSummary(Base):
+    """The tasks of one month of a habit, compacted into counts and the streak state at its boundaries."""
+    __tablename__ = 'task_summaries'
+
+    habit_id = Column(Integer, ForeignKey('habits.id', ondelete='CASCADE'), primary_key=True)
+    period_start = Column(types.DateTime, primary_key=True)  # First day of the month
+    period_end = Column(types.DateTime, nullable=False)  # end_date of the month's last task
+    completed_count = Column(Integer, nullable=False, default=0)
+    missed_count = Column(Integer, nullable=False, default=0)
+    leading_streak = Column(Integer, nullable=False, default=0)  # Completed tasks before the first missed one
+    trailing_streak = Column(Integer, nullable=False, default=0)  # Completed tasks after the last missed one
+    longest_streak = Column(Integer, nullable=False, default=0)
+    last_completed_end = Column(types.DateTime, nullable=True)
+
+class UserDailyStats(Base):
+    """Rollup of a user's activity on one day, maintained incrementally by app.rollups."""
+    __tablename__ = 'user_daily_stats'
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    day = Column(types.Date, primary_key=True)
+    completed_count = Column(Integer, nullable=False, default=0)  # Tasks completed that day
+    missed_count = Column(Integer, nullable=False, default=0)  # Tasks whose deadline passed that day uncompleted
+    active_habits = Column(Integer, nullable=False, default=0)  # Habits with a task open that day
+
+class RollupWatermark(Base):
+    """The time up to which a rollup has taken the task changes into account."""
+    __tablename__ = 'rollup_watermarks'
+
+    name = Column(String, primary_key=True)
+    watermark = Column(types.DateTime, nullable=False)
+
+class LeaderboardEntry(Base):
+    """A habit among the top current streaks, see app.leaderboard. Holds at most LEADERBOARD_CACHE_SIZE rows."""
+    __tablename__ = 'leaderboard_entries'
+
+    habit_id = Column(Integer, ForeignKey('habits.id', ondelete='CASCADE'), primary_key=True)
+    streak = Column(Integer, nullable=False)
+
+class LeaderboardState(Base):
+    """
+    The single row describing the leaderboard cache: every habit outside of it ranks at or after the floor,
+    (floor_streak, floor_habit_id). A floor_streak of -1 means the cache holds every habit.
+    """
+    __tablename__ = 'leaderboard_state'
+
+    id = Column(Integer, primary_key=True)
+    floor_streak = Column(Integer, nullable=False)
+    floor_habit_id = Column(Integer, nullable=True)
+    built_at = Column(types.DateTime, nullable=False)
+
+def task_runs_query(habit_ids: list = None):
+    """
+    Build a query of a habit's history as runs of (habit_id, start_date, seq, completed, end_date, length),
+    in period order by (start_date, seq). Every task is a run of length 1. A compacted month becomes the runs
+    that keep its streaks: its completed tasks if none was missed, otherwise its leading run, a miss, its
+    longest run, a miss and its trailing run.
+    """
+    tasks = select(
+        Task.habit_id, Task.start_date, Task.id.label('seq'), func.coalesce(Task.completed, False).label('completed'),
+        Task.end_date, literal(1).label('length'),
+    )
+    if habit_ids is not None:
+        tasks = tasks.where(Task.habit_id.in_(habit_ids))
+
+    missed = TaskSummary.missed_count > 0
+    shapes = [
+        (1, True, case((missed, TaskSummary.leading_streak), else_=TaskSummary.completed_count), None),
+        (2, False, literal(1), missed),
+        (3, True, TaskSummary.longest_streak, missed),
+        (4, False, literal(1), missed),
+        (5, True, TaskSummary.trailing_streak, missed),
+    ]
+    runs = [tasks]
+    for seq, completed, length, condition in shapes:
+        summaries = select(
+            TaskSummary.habit_id, TaskSummary.period_start, literal(seq), literal(completed), TaskSummary.period_end, length,
+        )
+        if condition is not None:
+            summaries = summaries.where(condition)
+        if habit_ids is not None:
+            summaries = summaries.where(TaskSummary.habit_id.in_(habit_ids))
+        runs.append(summaries)
+    return union_all(*runs)
+
+def tasks_count_query(habit_id):
+    """Scalar subquery counting the tasks of `habit_id` (a value or a correlated column), compacted ones included."""
+    tasks = select(func.count(Task.id)).where(Task.habit_id == habit_id).scalar_subquery()
+    compacted = (
+        select(func.coalesce(func.sum(TaskSummary.completed_count + TaskSummary.missed_count), 0))
+        .where(TaskSummary.habit_id == habit_id)
+        .scalar_subquery()
+    )
+    return tasks + compacted
@@ -0,0 +1,89 @@
+"""
+Monthly range partitions of the tasks table on start_date. Partitions are named tasks_pYYYY_MM, rows
+outside of every partition land in tasks_default.
+"""
+import re
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+DEFAULT_PARTITION = 'tasks_default'
+PARTITION_NAME = re.compile(r'^tasks_p(\d{4})_(\d{2})$')
+
+def month_start(date: datetime) -> datetime:
+    return datetime(date.year, date.month, 1)
+
+def next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def partition_name(month: datetime) -> str:
+    return f"tasks_p{month.year:04d}_{month.month:02d}"
+
+def get_task_partitions(db: Session) -> dict:
+    """Map the name of every monthly partition attached to tasks to the first day of its month."""
+    names = db.scalars(text(
+        "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'tasks'::regclass"
+    )).all()
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[name] = datetime(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+def create_task_partitions(db: Session, start: datetime, end: datetime) -> list:
+    """
+    Create the missing monthly partitions covering `start` to `end` and the default partition.
+    Rows of a new month already in the default partition are moved into it. Returns the created names.
+    """
+    existing = get_task_partitions(db)
+    if not db.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': DEFAULT_PARTITION}):
+        db.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF tasks DEFAULT"))
+
+    created = []
+    month = month_start(start)
+    while month <= end:
+        name = partition_name(month)
+        if name not in existing:
+            bounds = {'start': month, 'end': next_month(month)}
+            in_month = "start_date >= :start AND start_date < :end"
+            stray_rows = db.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month})"), bounds)
+            if stray_rows:
+                # A partition can't be created while the default one holds rows of its range
+                db.execute(text(f"ALTER TABLE tasks DETACH PARTITION {DEFAULT_PARTITION}"))
+            db.execute(text(
+                f"CREATE TABLE {name} PARTITION OF tasks FOR VALUES FROM ('{bounds['start'].isoformat()}') "
+                f"TO ('{bounds['end'].isoformat()}')"
+            ))
+            if stray_rows:
+                db.execute(text(f"INSERT INTO tasks SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}"), bounds)
+                db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"), bounds)
+                db.execute(text(f"ALTER TABLE tasks ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+            created.append(name)
+        month = next_month(month)
+    db.commit()
+    return created
+
+def create_future_task_partitions(db: Session, months_ahead: int, now: datetime = None) -> list:
+    """Create the partitions of the current month and the next `months_ahead` months."""
+    end = month_start(now or datetime.now())
+    for _ in range(months_ahead):
+        end = next_month(end)
+    return create_task_partitions(db, now or datetime.now(), end)
+
+def detach_task_partitions(db: Session, before: datetime, drop: bool = False) -> list:
+    """
+    Detach the monthly partitions whose month ends on or before `before`, so their rows leave the tasks
+    table but stay queryable as plain tables. With `drop` the tables are deleted. Returns the names.
+    """
+    detached = []
+    for name, month in sorted(get_task_partitions(db).items(), key=lambda partition: partition[1]):
+        if next_month(month) > before:
+            continue
+        db.execute(text(f"ALTER TABLE tasks DETACH PARTITION {name}"))
+        if drop:
+            db.execute(text(f"DROP TABLE {name}"))
+        detached.append(name)
+    db.commit()
+    return detached
@@ -0,0 +1,77 @@
+"""
+Period calendar: the exact boundaries of the periods of every periodicity. A period is identified by its index,
+the number of days (daily, weekly, fortnightly) or months (monthly and longer) from 1970-01-01 to its start, so
+the boundaries of each period are computed once and cached. Months, quarters, half years and years start on
+the calendar boundaries; weekly and fortnightly periods start on any day, the day their task is created.
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+EPOCH = datetime(1970, 1, 1)
+
+# The unit of the index of each periodicity and the number of units in a period
+PERIOD_UNITS = {
+    'daily': ('day', 1),
+    'weekly': ('day', 7),
+    'fortnightly': ('day', 14),
+    'monthly': ('month', 1),
+    'quarterly': ('month', 3),
+    'biannually': ('month', 6),
+    'yearly': ('month', 12),
+}
+
+# A period ends on the last microsecond before the next one starts
+END_OFFSET = timedelta(microseconds=1)
+
+def period_unit(periodicity: str) -> tuple:
+    """The (unit, length) of the periods of `periodicity`."""
+    try:
+        return PERIOD_UNITS[periodicity]
+    except KeyError:
+        raise ValueError("Invalid periodicity value") from None
+
+def unit_start(unit: str, index: int) -> datetime:
+    """Start of the `index`-th day or month from the epoch."""
+    if unit == 'day':
+        return EPOCH + timedelta(days=index)
+    return datetime(EPOCH.year + index // 12, index % 12 + 1, 1)
+
+def period_index(periodicity: str, at: datetime) -> int:
+    """Index of the period of `at`: the one containing it, or starting on its day for the periods of days."""
+    unit, length = period_unit(periodicity)
+    if unit == 'day':
+        return (at.date() - EPOCH.date()).days
+    months = (at.year - EPOCH.year) * 12 + at.month - 1
+    return months - months % length
+
+@lru_cache(maxsize=4096)
+def period_bounds(periodicity: str, index: int) -> tuple:
+    """The (start, end) of the period `index` of `periodicity`, computed once per period."""
+    unit, length = period_unit(periodicity)
+    return unit_start(unit, index), unit_start(unit, index + length) - END_OFFSET
+
+def current_period(periodicity: str, now: datetime = None) -> tuple:
+    """The (start, end) of the period of `now`."""
+    return period_bounds(periodicity, period_index(periodicity, now or datetime.now()))
+
+def previous_period(periodicity: str, now: datetime = None) -> tuple:
+    """The (start, end) of the period before the period of `now`."""
+    _, length = period_unit(periodicity)
+    return period_bounds(periodicity, period_index(periodicity, now or datetime.now()) - length)
+
+def period_indexes(periodicity: str, start: datetime, end: datetime):
+    """NumPy array of the indexes of the periods from the period of `start` to the one of `end`."""
+    import numpy as np
+    _, length = period_unit(periodicity)
+    return np.arange(period_index(periodicity, start), period_index(periodicity, end) + 1, length, dtype=np.int64)
+
+def period_bounds_array(periodicity: str, indexes):
+    """The starts and ends of many periods at once, as two NumPy datetime64[us] arrays."""
+    import numpy as np
+    unit, length = period_unit(periodicity)
+    indexes = np.asarray(indexes, dtype=np.int64)
+    # Integers are days or months from the epoch in the datetime64 unit they are cast to
+    dtype = 'datetime64[D]' if unit == 'day' else 'datetime64[M]'
+    starts = indexes.astype(dtype).astype('datetime64[us]')
+    ends = (indexes + length).astype(dtype).astype('datetime64[us]') - np.timedelta64(1, 'us')
+    return starts, ends
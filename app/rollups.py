@@ -0,0 +1,93 @@
+"""
+Incremental per-user, per-day analytics rollups. Each refresh finds the users whose tasks changed, or whose
+tasks expired, since the last watermark and rebuilds only their days from the earliest one those tasks touch.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import text, select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from .models import RollupWatermark
+
+ROLLUP_NAME = 'user_daily_stats'
+
+# Rows are stamped with the time their transaction started, a transaction still open when the watermark was
+# taken commits rows older than it. Rebuilding a day twice is harmless, so every refresh looks back this far.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# The users with tasks changed or expired since the watermark, with the first day to rebuild. When the refresh
+# crosses into a new day, the users with a task open since the watermark's day are rebuilt from that day too,
+# so the days on which nothing changed still get their row of active habits.
+CHANGED_USERS = text("""
+    SELECT h.user_id,
+           MIN(LEAST(
+               CASE WHEN t.updated_at > :since THEN LEAST(t.start_date, t.completed_at) END,
+               CASE WHEN t.end_date > :since AND t.end_date <= :now THEN t.end_date END,
+               CASE WHEN :new_day AND t.start_date <= :now AND t.end_date >= :watermark_day THEN :watermark_day END
+           ))::date
+    FROM tasks t
+    JOIN habits h ON h.id = t.habit_id
+    WHERE t.updated_at > :since OR (t.end_date > :since AND t.end_date <= :now)
+       OR (:new_day AND t.start_date <= :now AND t.end_date >= :watermark_day)
+    GROUP BY h.user_id
+""")
+
+CLEAR_DAYS = text("""
+    DELETE FROM user_daily_stats s
+    USING unnest(CAST(:user_ids AS integer[]), CAST(:days AS date[])) AS c(user_id, since)
+    WHERE s.user_id = c.user_id AND s.day >= c.since
+""")
+
+# A task counts as completed on the day it was completed, as missed on the day its deadline passed and makes
+# its habit active on every day it was open, up to today
+REBUILD_DAYS = text("""
+    INSERT INTO user_daily_stats (user_id, day, completed_count, missed_count, active_habits)
+    WITH changed AS (
+        SELECT * FROM unnest(CAST(:user_ids AS integer[]), CAST(:days AS date[])) AS c(user_id, since)
+    ), recent AS (
+        SELECT c.user_id, c.since, t.habit_id, t.start_date, t.end_date, COALESCE(t.completed, false) AS completed,
+               COALESCE(t.completed_at, t.end_date) AS completed_at
+        FROM changed c
+        JOIN habits h ON h.user_id = c.user_id
+        JOIN tasks t ON t.habit_id = h.id AND t.end_date >= c.since
+    ), events AS (
+        SELECT user_id, completed_at::date AS day, 1 AS completed, 0 AS missed, NULL::integer AS habit_id
+        FROM recent WHERE completed AND completed_at >= since
+        UNION ALL
+        SELECT user_id, end_date::date, 0, 1, NULL FROM recent WHERE NOT completed AND end_date <= :now
+        UNION ALL
+        SELECT user_id, day::date, 0, 0, habit_id
+        FROM recent, generate_series(GREATEST(start_date::date, since), LEAST(end_date, :now)::date, interval '1 day') AS day
+    )
+    SELECT user_id, day, SUM(completed), SUM(missed), COUNT(DISTINCT habit_id)
+    FROM events
+    GROUP BY user_id, day
+""")
+
+def get_rollup_watermark(db: Session, name: str = ROLLUP_NAME):
+    """The time the rollup was last refreshed up to, None before its first refresh."""
+    return db.scalar(select(RollupWatermark.watermark).where(RollupWatermark.name == name))
+
+def refresh_user_daily_stats(db: Session) -> int:
+    """
+    Bring the per-user, per-day rollup up to date with the task changes since the last refresh, recomputing
+    only the users whose tasks changed. The first refresh builds it for every user. Returns the number of
+    users recomputed.
+    """
+    now = db.scalar(select(func.localtimestamp()))
+    watermark = get_rollup_watermark(db)
+    since = watermark - WATERMARK_OVERLAP if watermark else datetime.min
+    watermark_day = datetime.combine((watermark or now).date(), datetime.min.time())
+
+    changed = db.execute(CHANGED_USERS, {
+        'since': since, 'now': now, 'new_day': watermark is not None and watermark.date() < now.date(),
+        'watermark_day': watermark_day,
+    }).all()
+    if changed:
+        params = {'user_ids': [user_id for user_id, _ in changed], 'days': [day for _, day in changed], 'now': now}
+        db.execute(CLEAR_DAYS, params)
+        db.execute(REBUILD_DAYS, params)
+
+    upsert = insert(RollupWatermark).values(name=ROLLUP_NAME, watermark=now)
+    db.execute(upsert.on_conflict_do_update(index_elements=[RollupWatermark.name], set_={'watermark': now}))
+    db.commit()
+    return len(changed)
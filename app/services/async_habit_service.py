@@ -0,0 +1,107 @@
+from ..models import User, Habit, Task, tasks_count_query
+from ..leaderboard import update_leaderboard
+from .habit_service import HabitService
+from .util import compute_start_and_end_date
+from datetime import datetime
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+class AsyncHabitService:
+    """HabitService on an AsyncSession. Relationships are never lazy loaded, related rows are queried explicitly."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create_habit(self, user, name: str, periodicity: str, created_at=None, should_add_task=True):
+        """Create a new habit for a user."""
+        habit = Habit(name=name, periodicity=periodicity, user_id=user.id, created_at=created_at or datetime.now(),
+                      current_streak=0, longest_streak=0)
+        self.session.add(habit)
+        await self.session.flush()
+        await self.session.run_sync(update_leaderboard, habit.id, habit.current_streak)
+        if should_add_task:
+            await self.add_task(habit)  # Add a task for current period
+        return habit
+
+    def get_habit_task_end_date(self, habit: Habit, now: datetime = None, timezone: str = None):
+        """The start and end date of the task of the current period, in the timezone of the habit's user."""
+        return compute_start_and_end_date(habit.periodicity, now, timezone)
+
+    async def add_task(self, habit: Habit, should_commit=True, now: datetime = None):
+        """Add a task for the habit for the period of `now`, defaults to the current time."""
+        timezone = await self.session.scalar(select(User.timezone).where(User.id == habit.user_id))
+        start_date, end_date = self.get_habit_task_end_date(habit, now, timezone)
+        tasksLen = 0
+        if habit.id is not None:
+            tasksLen = await self.session.scalar(select(tasks_count_query(habit.id)))
+            latest_task = await self.session.scalar(
+                select(Task).where(Task.habit_id == habit.id).order_by(Task.start_date.desc(), Task.id.desc()).limit(1)
+            )
+            streak = habit.current_streak
+            habit.record_rollover(latest_task)  # The previous period is over
+            if habit.current_streak != streak:
+                await self.session.run_sync(update_leaderboard, habit.id, habit.current_streak)
+        description = f"{habit.name} task {tasksLen + 1}"
+        task = Task(description=description, completed=False, start_date=start_date, end_date=end_date, habit=habit)
+        self.session.add(task)
+
+        if should_commit:
+            await self.session.commit()
+        return task
+
+    async def update_habit(self, habit: Habit, name: str):
+        """Update the name of a habit."""
+        habit.name = name
+        await self.session.commit()
+
+    async def get_current_streaks(self, habit: Habit):
+        """Get the current streak for a habit based on task completion."""
+        return habit.current_streak
+
+    async def get_longest_streaks(self, habit: Habit):
+        """Get the longest streak for a habit based on task completion."""
+        return habit.longest_streak
+
+    async def get_habit(self, user_id: int, habit_id: int):
+        """Retrieve a habit by its ID."""
+        return await self.session.scalar(select(Habit).where(Habit.id == habit_id, Habit.user_id == user_id))
+
+    async def get_habit_tasks(self, habit: Habit, limit: int = None):
+        """Get the tasks of a habit in period order, only the last `limit` ones if given."""
+        if limit is None:
+            return (await self.session.scalars(habit.tasks.select())).all()
+        latest = habit.tasks.select().order_by(None).order_by(Task.start_date.desc(), Task.id.desc()).limit(limit)
+        return list(reversed((await self.session.scalars(latest)).all()))
+
+    async def get_user_habits(self, user: User):
+        """Get all habits of a user."""
+        return await self.get_user_habits_for_period(user.id)
+
+    async def get_all_habits(self):
+        """Get all habits."""
+        return (await self.session.scalars(select(Habit))).all()
+
+    async def get_due_habits(self, now: datetime = None):
+        """Get the habits whose current period has ended and need a task for the new one."""
+        return (await self.session.scalars(select(Habit).where(HabitService.is_due(now or datetime.now())))).all()
+
+    async def delete_habit(self, id: int, user: User):
+        # Fetch the habit for the given id and user
+        habit = await self.get_habit(user.id, id)
+
+        # Raise an error if the habit does not exist
+        if not habit:
+            raise ValueError("Habit does not exist")
+
+        # Delete all associated tasks for the habit
+        await self.session.execute(delete(Task).where(Task.habit_id == habit.id))
+
+        await self.session.delete(habit)
+        await self.session.commit()
+
+    async def get_user_habits_for_period(self, user_id: int, period: str=None):
+        """Retrieve habits for the current period (daily/weekly/fortnightly/monthly/biannually/yearly)."""
+        query = select(Habit).where(Habit.user_id == user_id)
+        if period is not None:
+            query = query.where(Habit.periodicity == period.lower())
+        return (await self.session.scalars(query)).all()
@@ -0,0 +1,45 @@
+from ..models import Task, Habit
+from ..leaderboard import update_leaderboard, rank_key
+from .task_service import complete_task_statement
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+class AsyncTaskService:
+    """TaskService on an AsyncSession."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def complete_task(self, user_id: int, task_id: int):
+        """Mark task as completed and update habit event, in a single conditional UPDATE. See TaskService.complete_task."""
+        row = (await self.session.execute(complete_task_statement(user_id, task_id, datetime.now()))).first()
+        if row is None:
+            return await self.check_not_completed(user_id, task_id)
+
+        task, streak, cached, floor_streak, floor_habit_id = row
+        if streak is None:
+            # An older period was completed out of order, rebuilding the streaks queries the tasks with the sync session
+            def recompute_streaks(session):
+                task.habit.recompute_streaks()
+                update_leaderboard(session, task.habit_id, task.habit.current_streak)
+            await self.session.run_sync(recompute_streaks)
+        elif not cached and floor_streak is not None and rank_key(streak, task.habit_id) < rank_key(floor_streak, floor_habit_id):
+            await self.session.run_sync(update_leaderboard, task.habit_id, streak)
+        await self.session.commit()
+        # Relationships are never lazy loaded, load the habit with its new streak counters for the caller
+        await self.session.get(Habit, task.habit_id, populate_existing=True)
+        return task
+
+    async def check_not_completed(self, user_id: int, task_id: int):
+        """Find out why complete_task did not complete a task: raise, or return the task if it was already completed."""
+        row = (await self.session.execute(
+            select(Habit.user_id, Task.completed).join(Habit, Task.habit_id == Habit.id).where(Task.id == task_id)
+        )).first()
+        if row is None:
+            return None
+        if row.user_id != user_id:
+            raise ValueError("Task does not belong to the user.")
+        if row.completed:
+            return await self.session.get(Task, task_id)
+        raise ValueError("Task is overdue and cannot be completed.")
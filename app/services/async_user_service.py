@@ -0,0 +1,94 @@
+import asyncio
+from ..models import User
+from .user_service import token_cache, encode_token, decode_token
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+class AsyncUserService:
+    """UserService on an AsyncSession. bcrypt runs in a worker thread so it does not block the event loop."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def register(self, name: str, email: str, password: str, should_commit: bool = True):
+        """Register a new user with hashed password."""
+        # Check if the user already exists by email
+        email = email.lower().strip()
+        existing_user = await self.get_user(email)
+        if existing_user:
+            raise ValueError(f"User with email {email} already exists.")
+
+        # Create new user and hash the password
+        user = User(name=name, email=email)
+        await asyncio.to_thread(user.set_password, password)
+        self.session.add(user)
+
+        if should_commit:
+            await self.session.commit()
+
+        return user
+
+    async def get_all_users(self):
+        """Retrieve all users."""
+        return (await self.session.scalars(select(User))).all()
+
+    async def get_user(self, email: str):
+        """Retrieve a user by their email."""
+        return await self.session.scalar(select(User).where(User.email == email))
+
+    async def get_user_by_id(self, user_id: int):
+        """Retrieve a user by their ID."""
+        return await self.session.get(User, user_id)
+
+    async def get_auth_token(self, email: str, user_id: int = None) -> str:
+        """Generate an authentication token for the user."""
+        if user_id is None:
+            user = await self.get_user(email)
+            user_id = user.id if user else None
+        return encode_token(email, user_id)
+
+    async def get_user_from_token(self, token: str) -> User:
+        if token == "":
+            return None
+
+        cached = token_cache.get(token)
+        if cached:
+            claims, user_id = cached
+            user = await self.get_user_by_id(user_id)
+            # The user may have been deleted or changed email since the token was cached
+            if user and user.email == claims.get('email'):
+                return user
+            token_cache.invalidate(token)
+
+        payload = decode_token(token)
+        email = payload.get('email') if payload else None
+        if email:
+            user = await self.get_user(email)
+            if user and payload.get('user_id') in (None, user.id):
+                token_cache.set(token, payload, user.id)
+                return user
+
+        return None
+
+    async def login(self, email: str, password: str):
+        """Login the user by verifying the password."""
+        user = await self.get_user(email.lower().strip())
+        if user and await asyncio.to_thread(user.check_password, password):
+            return user
+        return None  # Return None if authentication fails
+
+    async def update_password(self, email: str, old_password: str, new_password: str):
+        """Update the user's password after verifying the old password."""
+        user = await self.get_user(email)
+        if not user:
+            raise ValueError("User not found.")
+
+        if not await asyncio.to_thread(user.check_password, old_password):
+            raise ValueError("Old password is incorrect.")
+
+        await asyncio.to_thread(user.set_password, new_password)  # Hash and update password
+        await self.session.commit()
+        token_cache.invalidate_user(user.id)
+
+        return user
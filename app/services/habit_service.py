@@ -1,7 +1,10 @@
-from ..models import User, Habit
-from .util import compute_start_and_end_date
+from ..models import User, Habit, Task, tasks_count_query
+from ..leaderboard import update_leaderboard, reset_leaderboard_streaks, invalidate_leaderboard
+from ..timezones import user_timezones
+from .util import compute_start_and_end_date, PERIODICITIES
 from datetime import datetime
 from sqlalchemy.orm import Session
+from sqlalchemy import func, select, insert, update, literal, cast, exists, not_, or_, types
 
 class HabitService:
     def __init__(self, session: Session):
@@ -11,18 +14,24 @@ class HabitService:
         """Create a new habit for a user."""
         habit = Habit(name=name, periodicity=periodicity, user=user, created_at=created_at or datetime.now())
         self.session.add(habit)
+        self.session.flush()
+        update_leaderboard(self.session, habit.id, habit.current_streak)
         if should_add_task:
             self.add_task(habit)  # Add a task for current period
         return habit
 
-    def get_habit_task_end_date(self, habit: Habit):
-        return compute_start_and_end_date(habit.periodicity)
+    def get_habit_task_end_date(self, habit: Habit, now: datetime = None):
+        """The start and end date of the task of the current period, in the timezone of the habit's user."""
+        return compute_start_and_end_date(habit.periodicity, now, habit.user.timezone if habit.user else None)
 
-    def add_task(self, habit: Habit, should_commit=True):
-        """Add a task for the habit for the period."""
-        start_date, end_date = self.get_habit_task_end_date(habit)
-        tasksLen = len(habit.tasks)
-        description = f"{habit.name} task {tasksLen + 1}"
+    def add_task(self, habit: Habit, should_commit=True, now: datetime = None):
+        """Add a task for the habit for the period of `now`, defaults to the current time."""
+        start_date, end_date = self.get_habit_task_end_date(habit, now)
+        streak = habit.current_streak
+        habit.record_rollover(habit.get_latest_task())  # The previous period is over
+        if habit.current_streak != streak:
+            update_leaderboard(self.session, habit.id, habit.current_streak)
+        description = f"{habit.name} task {habit.count_tasks() + 1}"
         task = habit.add_task(description, start_date, end_date)
         self.session.add(task)
 
@@ -30,6 +39,77 @@ class HabitService:
             self.session.commit()
         return task
 
+    def add_tasks_for_due_habits(self, chunk_size: int = 10000, now: datetime = None, timezones: list = None):
+        """
+        Add the task of the current period to every due habit with set-based SQL instead of loading habits.
+        Habits are processed per timezone of their users and periodicity, `chunk_size` habits per
+        INSERT ... SELECT, and each chunk is committed on its own. `timezones` restricts the rollover to the
+        users of these timezones, None standing for the users without one; defaults to every timezone.
+        Returns the number of tasks created.
+        """
+        now = now or datetime.now()
+        if timezones is None:
+            timezones = [None, *filter(None, user_timezones(self.session))]
+        created = 0
+        for timezone in timezones:
+            in_timezone = self.in_timezone(timezone)
+            for periodicity in PERIODICITIES:
+                created += self.add_tasks_for_due_habits_of(periodicity, timezone, in_timezone, chunk_size, now)
+        return created
+
+    def add_tasks_for_due_habits_of(self, periodicity: str, timezone: str, in_timezone, chunk_size: int, now: datetime):
+        """Add the task of the current period to the due habits of `periodicity` matching `in_timezone`."""
+        start_date, end_date = compute_start_and_end_date(periodicity, now, timezone)
+        is_due = self.is_due(start_date)
+        created = 0
+        last_id = 0
+        while True:
+            habit_ids = self.session.scalars(
+                select(Habit.id)
+                .where(Habit.periodicity == periodicity, Habit.id > last_id, is_due, in_timezone)
+                .order_by(Habit.id)
+                .limit(chunk_size)
+            ).all()
+            if not habit_ids:
+                break
+            last_id = habit_ids[-1]
+            in_chunk = (Habit.periodicity == periodicity, Habit.id.between(habit_ids[0], last_id), is_due, in_timezone)
+
+            # The previous period is over, reset the streak where its task was not completed
+            latest_task_completed = (
+                select(func.coalesce(Task.completed, False))
+                .where(Task.habit_id == Habit.id)
+                .order_by(Task.start_date.desc(), Task.id.desc())
+                .limit(1)
+                .scalar_subquery()
+            )
+            reset = self.session.scalars(
+                update(Habit)
+                .where(*in_chunk, not_(func.coalesce(latest_task_completed, True)))
+                .values(current_streak=0)
+                .returning(Habit.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            reset_leaderboard_streaks(self.session, reset)
+
+            tasks_count = tasks_count_query(Habit.id)
+            new_tasks = select(
+                Habit.name + ' task ' + cast(tasks_count + 1, types.String),
+                literal(start_date, types.DateTime),
+                literal(end_date, types.DateTime),
+                func.now(),
+                literal(False),
+                Habit.id,
+            ).where(*in_chunk)
+            result = self.session.execute(
+                insert(Task).from_select(
+                    ['description', 'start_date', 'end_date', 'updated_at', 'completed', 'habit_id'], new_tasks
+                )
+            )
+            self.session.commit()
+            created += result.rowcount
+        return created
+
     def update_habit(self, habit: Habit, name: str):
         """Update the name and periodicity of a habit."""
         habit.name = name
@@ -37,11 +117,21 @@ class HabitService:
 
     def get_current_streaks(self, habit: Habit):
         """Get the current streak for a habit based on task completion."""
-        return habit.get_current_streaks()
+        return habit.current_streak
     
     def get_longest_streaks(self, habit: Habit):
-        """Get the current streak for a habit based on task completion."""
-        return habit.get_longest_streaks()
+        """Get the longest streak for a habit based on task completion."""
+        return habit.longest_streak
+
+    def recompute_streaks(self, habits=None):
+        """Rebuild the stored streak counters from the tasks table. Defaults to all habits."""
+        if habits is None:
+            habits = self.get_all_habits()
+        for habit in habits:
+            habit.recompute_streaks()
+        invalidate_leaderboard(self.session)
+        self.session.commit()
+        return len(habits)
 
     def get_habit(self, user_id: int, habit_id: int):
         """Retrieve a habit by its ID."""
@@ -55,6 +145,22 @@ class HabitService:
         """Get all habits."""
         return self.session.query(Habit).all()
 
+    @staticmethod
+    def in_timezone(timezone: str):
+        """Condition matching the habits of the users of `timezone`, or of users without one when None."""
+        if timezone:
+            return Habit.user_id.in_(select(User.id).where(User.timezone == timezone))
+        return or_(Habit.user_id.is_(None), Habit.user_id.in_(select(User.id).where(User.timezone.is_(None))))
+
+    @staticmethod
+    def is_due(now: datetime):
+        """Condition matching habits without a task still open at `now`, i.e. whose current period has ended."""
+        return not_(exists().where(Task.habit_id == Habit.id, Task.end_date >= now))
+
+    def get_due_habits(self, now: datetime = None):
+        """Get the habits whose current period has ended and need a task for the new one."""
+        return self.session.query(Habit).filter(self.is_due(now or datetime.now())).all()
+
     def delete_habit(self, id: int, user: User):
         # Fetch the habit for the given id and user
         habit = self.session.query(Habit).filter(Habit.id == id, Habit.user_id == user.id).first()
@@ -63,10 +169,7 @@ class HabitService:
         if not habit:
             raise ValueError("Habit does not exist")
 
-        # Delete all associated tasks for the habit
-        for task in habit.tasks:
-            self.session.delete(task)
-
+        # The tasks of the habit are deleted by the database (ON DELETE CASCADE)
         self.session.delete(habit)
         self.session.commit()
 
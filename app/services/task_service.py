@@ -1,17 +1,173 @@
-from ..models import Task
+from ..models import Task, TaskSummary, Habit, LeaderboardEntry, LeaderboardState
+from ..leaderboard import STATE_ID, update_leaderboard, rank_key
+from datetime import datetime
+from sqlalchemy import select, update, tuple_, func, or_
 from sqlalchemy.orm import Session
 
+def complete_task_statement(user_id: int, task_id: int, now: datetime):
+    """
+    Build the UPDATE ... RETURNING completing a task only if it belongs to the user, is still open and not overdue.
+    CTEs on the same conditions bump the habit's streak counters, when the task is the habit's latest completed
+    period, and its leaderboard cache entry. Returns the task with the new current streak (None when the
+    counters were not bumped), whether the habit is in the leaderboard cache and the cache's floor.
+    """
+    can_complete = (
+        Task.id == task_id, Task.habit_id == Habit.id, Habit.user_id == user_id,
+        func.coalesce(Task.completed, False) == False, Task.end_date >= now,
+    )
+    streaks = (
+        update(Habit)
+        .where(*can_complete, or_(Habit.last_completed_period_end.is_(None), Task.end_date > Habit.last_completed_period_end))
+        .values(
+            current_streak=Habit.current_streak + 1,
+            longest_streak=func.greatest(Habit.longest_streak, Habit.current_streak + 1),
+            last_completed_period_end=Task.end_date,
+        )
+        .returning(Habit.id, Habit.current_streak)
+        .cte('streaks')
+    )
+    entries = (
+        update(LeaderboardEntry)
+        .where(LeaderboardEntry.habit_id == streaks.c.id)
+        .values(streak=streaks.c.current_streak)
+        .returning(LeaderboardEntry.habit_id)
+        .cte('entries')
+    )
+    # The floor only improves until the cache is rebuilt, the lock keeps rebuilds from reading the streaks
+    # before the completion commits
+    state = (
+        select(LeaderboardState.floor_streak, LeaderboardState.floor_habit_id)
+        .where(LeaderboardState.id == STATE_ID)
+        .with_for_update(read=True, key_share=True)
+        .cte('state')
+    )
+    return (
+        update(Task)
+        .where(*can_complete)
+        .values(completed=True, completed_at=now)
+        .returning(
+            Task,
+            select(streaks.c.current_streak).scalar_subquery(),
+            select(func.count()).select_from(entries).scalar_subquery(),
+            select(state.c.floor_streak).scalar_subquery(),
+            select(state.c.floor_habit_id).scalar_subquery(),
+        )
+        .add_cte(streaks)
+        .add_cte(entries)
+        .add_cte(state)
+        # Refresh the task if it is already in the session
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+
 class TaskService:
     def __init__(self, session: Session):
         self.session = session
 
     def complete_task(self, user_id: int, task_id: int):
-        """Mark task as completed and update habit event."""
-        task = self.session.query(Task).filter(Task.id == task_id).first()
-        if task:
-            habit = task.habit
-            if habit.user_id != user_id:
-                raise ValueError("Task does not belong to the user.")
-            task.complete()  # Mark the task as completed
-            self.session.commit()
+        """
+        Mark task as completed and update habit event, in a single conditional UPDATE. Completing a task that
+        is already completed, as when two requests complete it concurrently, leaves it unchanged.
+        """
+        row = self.session.execute(complete_task_statement(user_id, task_id, datetime.now())).first()
+        if row is None:
+            return self.check_not_completed(user_id, task_id)
+
+        task, streak, cached, floor_streak, floor_habit_id = row
+        if streak is None:
+            # An older period was completed out of order, it may join two runs
+            task.habit.recompute_streaks()
+            update_leaderboard(self.session, task.habit_id, task.habit.current_streak)
+        elif not cached and floor_streak is not None and rank_key(streak, task.habit_id) < rank_key(floor_streak, floor_habit_id):
+            update_leaderboard(self.session, task.habit_id, streak)  # The habit enters the leaderboard cache
+        self.session.commit()
         return task
+
+    def check_not_completed(self, user_id: int, task_id: int):
+        """Find out why complete_task did not complete a task: raise, or return the task if it was already completed."""
+        row = self.session.execute(
+            select(Habit.user_id, Task.completed).join(Habit, Task.habit_id == Habit.id).where(Task.id == task_id)
+        ).first()
+        if row is None:
+            return None
+        if row.user_id != user_id:
+            raise ValueError("Task does not belong to the user.")
+        if row.completed:
+            return self.session.get(Task, task_id)
+        raise ValueError("Task is overdue and cannot be completed.")
+
+    def complete_tasks(self, user_id: int, task_ids: list, now: datetime = None) -> dict:
+        """
+        Mark many tasks as completed with a single UPDATE ... FROM habits ... RETURNING, which checks ownership
+        and the deadline of all of them at once, then update the streaks of their habits and commit.
+        Returns the error of every task ID in input order, None for the tasks completed.
+        """
+        now = now or datetime.now()
+        task_ids = list(dict.fromkeys(task_ids))
+        completed = self.session.execute(
+            update(Task)
+            .where(
+                Task.habit_id == Habit.id, Habit.user_id == user_id, Task.id.in_(task_ids),
+                func.coalesce(Task.completed, False) == False, Task.end_date >= now,
+            )
+            .values(completed=True, completed_at=now)
+            .returning(Task.id, Task.habit_id, Task.end_date)
+            .execution_options(synchronize_session=False)
+        ).all()
+        results = dict.fromkeys(task_ids, "Task not found.")
+        for task_id, _, _ in completed:
+            results[task_id] = None
+
+        # Find out why the other tasks were not completed
+        failed = [task_id for task_id, error in results.items() if error]
+        if failed:
+            rows = self.session.execute(
+                select(Task.id, Habit.user_id, Task.completed).join(Habit, Task.habit_id == Habit.id).where(Task.id.in_(failed))
+            )
+            for task_id, owner_id, is_completed in rows:
+                if owner_id != user_id:
+                    results[task_id] = "Task does not belong to the user."
+                elif is_completed:
+                    results[task_id] = "Task is already completed."
+                else:
+                    results[task_id] = "Task is overdue and cannot be completed."
+
+        # Oldest period first, like completing the tasks one at a time
+        habit_ids = {habit_id for _, habit_id, _ in completed}
+        habits = {habit.id: habit for habit in self.session.scalars(select(Habit).where(Habit.id.in_(habit_ids)))}
+        for task in sorted(completed, key=lambda task: task.end_date):
+            habits[task.habit_id].record_completion(task)
+        for habit in habits.values():
+            update_leaderboard(self.session, habit.id, habit.current_streak)
+        self.session.commit()
+        return results
+
+    def list_tasks(self, habit_id: int, limit: int = None, after_id: int = None, since: datetime = None,
+                   descending: bool = False, batch_size: int = 500):
+        """
+        Stream the tasks of a habit ordered by start date, fetching `batch_size` rows at a time.
+        `after_id` continues a previous page after that task with a keyset on (start_date, id),
+        which the (habit_id, start_date) index serves without an offset scan.
+        """
+        key = tuple_(Task.start_date, Task.id)
+        query = select(Task).where(Task.habit_id == habit_id)
+        if since is not None:
+            query = query.where(Task.start_date >= since)
+        if after_id is not None:
+            after = select(Task.start_date).where(Task.id == after_id, Task.habit_id == habit_id).scalar_subquery()
+            cursor = tuple_(after, after_id)
+            query = query.where(key < cursor if descending else key > cursor)
+        if descending:
+            query = query.order_by(Task.start_date.desc(), Task.id.desc())
+        else:
+            query = query.order_by(Task.start_date, Task.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return self.session.scalars(query.execution_options(yield_per=batch_size))
+
+    def list_task_summaries(self, habit_id: int, since: datetime = None, descending: bool = False):
+        """Get the compacted months of a habit ordered by month, those ending on or after `since` if given."""
+        query = select(TaskSummary).where(TaskSummary.habit_id == habit_id)
+        if since is not None:
+            query = query.where(TaskSummary.period_end >= since)
+        order = TaskSummary.period_start.desc() if descending else TaskSummary.period_start
+        return self.session.scalars(query.order_by(order)).all()
@@ -0,0 +1,58 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+class TokenCache:
+    """
+    Bounded LRU cache of decoded auth tokens, so a long-lived process verifies each token and
+    resolves its user only once. Entries expire after `ttl` seconds or when the token itself
+    expires, whichever comes first, and can be dropped per user when the user changes.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (claims, user_id, expires_at)
+        self._lock = Lock()
+
+    def get(self, token: str):
+        """Return the cached (claims, user_id) of a token, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            claims, user_id, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return claims, user_id
+
+    def set(self, token: str, claims: dict, user_id: int):
+        """Cache the decoded claims and user id of a token."""
+        expires_at = time.time() + self.ttl
+        if claims.get('exp') is not None:
+            expires_at = min(expires_at, claims['exp'])
+        with self._lock:
+            self._entries[token] = (claims, user_id, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str):
+        """Drop a single token from the cache."""
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token resolving to the given user."""
+        with self._lock:
+            for token in [token for token, entry in self._entries.items() if entry[1] == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,56 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from validation import is_valid_email, is_valid_password
+from ..models import hash_password
+
+@dataclass
+class ImportResult:
+    """Outcome of a bulk user import. Failures are (line, email, error) tuples."""
+    created: int = 0
+    failures: list = field(default_factory=list)
+
+INVALID_RECORD = "Invalid JSON record."
+
+def parse_json_record(text: str):
+    """The JSON object of a JSONL line, None if the line is not valid JSON or not an object."""
+    try:
+        record = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return record if isinstance(record, dict) else None
+
+def record_error(name: str, email: str, password: str):
+    """The reason a user record cannot be imported, None if it is valid."""
+    if not name:
+        return "Name cannot be empty."
+    if not is_valid_email(email):
+        return "Invalid email format."
+    if not is_valid_password(password):
+        return "Password does not meet the requirements."
+    return None
+
+def read_user_records(path: str):
+    """
+    Read (line, record) pairs from a CSV file with a name,email,password header, or from a JSONL file.
+    The record of a JSONL line that is not a JSON object is None, so it is reported instead of aborting the import.
+    """
+    with open(path, newline='') as f:
+        if path.endswith('.jsonl'):
+            for line, text in enumerate(f, 1):
+                if text.strip():
+                    yield line, parse_json_record(text)
+        else:
+            # Line 1 is the header
+            for line, row in enumerate(csv.DictReader(f), 2):
+                yield line, row
+
+def hash_passwords(passwords: list, workers: int = None) -> list:
+    """Hash passwords with bcrypt across a process pool, one worker per CPU by default."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < 2:
+        return [hash_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(hash_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
@@ -1,11 +1,42 @@
 from ..models import User
 from ..config import config
+from ..timezones import is_valid_timezone
+from .token_cache import TokenCache
+from .user_import import ImportResult, INVALID_RECORD, record_error, hash_passwords
 
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 import jsonwebtoken as jwt
 
 ALGORITHM = 'HS256'
 
+# Shared by every UserService in the process
+token_cache = TokenCache(config.TOKEN_CACHE_SIZE, config.TOKEN_CACHE_TTL)
+
+def encode_token(email: str, user_id: int) -> str:
+    """Sign a token identifying the user, valid for TOKEN_EXPIRY_HOURS."""
+    jwt_payload = {
+        'email': email,
+        'user_id': user_id,
+        'exp': datetime.now(timezone.utc) + timedelta(hours=config.TOKEN_EXPIRY_HOURS),
+    }
+    return jwt.encode(jwt_payload, config.SECRET_KEY, algorithm=ALGORITHM)
+
+def decode_token(token: str) -> dict:
+    """Verify a token and return its claims, or None if it is invalid or expired."""
+    try:
+        return jwt.decode(token, config.SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        print("Token has expired.")
+    except jwt.InvalidTokenError:
+        print("Invalid token.")
+    except Exception as e:
+        print(f"Error decoding token: {e}")
+
+    return None
+
 class UserService:
     def __init__(self, session: Session):
         self.session = session
@@ -28,6 +59,65 @@ class UserService:
 
         return user
     
+    def import_users(self, records, batch_size: int = 1000, workers: int = None) -> ImportResult:
+        """
+        Register many users at once from (line, {name, email, password}) records, None for unreadable lines.
+        Records are validated like a registration, existing emails are found with one query, passwords are hashed
+        in a process pool and users are inserted in batches. Rows that fail are reported in the result instead of
+        aborting the import.
+        """
+        result = ImportResult()
+        users = []
+        seen = set()
+        for line, record in records:
+            if record is None:
+                result.failures.append((line, '', INVALID_RECORD))
+                continue
+            name = (record.get('name') or '').strip()
+            email = (record.get('email') or '').lower().strip()
+            password = record.get('password') or ''
+            error = record_error(name, email, password)
+            if error is None and email in seen:
+                error = "Duplicate email in import."
+            if error:
+                result.failures.append((line, email, error))
+                continue
+            seen.add(email)
+            users.append((line, {'name': name, 'email': email, 'password': password}))
+
+        existing = set(self.session.scalars(select(User.email).where(User.email.in_(list(seen)))).all())
+        new_users = []
+        for line, user in users:
+            if user['email'] in existing:
+                result.failures.append((line, user['email'], f"User with email {user['email']} already exists."))
+            else:
+                new_users.append((line, user))
+
+        password_hashes = hash_passwords([user.pop('password') for _, user in new_users], workers)
+        for (_, user), password_hash in zip(new_users, password_hashes):
+            user['password_hash'] = password_hash
+
+        for start in range(0, len(new_users), batch_size):
+            batch = new_users[start:start + batch_size]
+            try:
+                self.session.execute(insert(User), [user for _, user in batch])
+                self.session.commit()
+                result.created += len(batch)
+            except IntegrityError:
+                # Someone registered one of the emails meanwhile, insert the batch row by row
+                self.session.rollback()
+                for line, user in batch:
+                    try:
+                        self.session.execute(insert(User), [user])
+                        self.session.commit()
+                        result.created += 1
+                    except IntegrityError as e:
+                        self.session.rollback()
+                        result.failures.append((line, user['email'], str(e.orig).strip()))
+
+        result.failures.sort()
+        return result
+
     def get_all_users(self):
         """Retrieve all users."""
         return self.session.query(User).all()
@@ -41,25 +131,33 @@ class UserService:
         """Retrieve a user by their ID."""
         return self.session.query(User).filter(User.id == user_id).first()
 
-    def get_auth_token(self, email: str) -> str:
+    def get_auth_token(self, email: str, user_id: int = None) -> str:
         """Generate an authentication token for the user."""
-        jwt_payload = {'email': email}
-        return jwt.encode(jwt_payload, config.SECRET_KEY, algorithm=ALGORITHM)
+        if user_id is None:
+            user = self.get_user(email)
+            user_id = user.id if user else None
+        return encode_token(email, user_id)
 
     def get_user_from_token(self, token: str) -> User:
         if token == "":
             return None 
-        try:
-            payload = jwt.decode(token, config.SECRET_KEY, algorithms=[ALGORITHM])
-            email = payload.get('email')
-            if email:
-                return self.get_user(email)
-        except jwt.ExpiredSignatureError:
-            print("Token has expired.")
-        except jwt.InvalidTokenError:
-            print("Invalid token.")
-        except Exception as e:
-            print(f"Error decoding token: {e}")
+
+        cached = token_cache.get(token)
+        if cached:
+            claims, user_id = cached
+            user = self.get_user_by_id(user_id)
+            # The user may have been deleted or changed email since the token was cached
+            if user and user.email == claims.get('email'):
+                return user
+            token_cache.invalidate(token)
+
+        payload = decode_token(token)
+        email = payload.get('email') if payload else None
+        if email:
+            user = self.get_user(email)
+            if user and payload.get('user_id') in (None, user.id):
+                token_cache.set(token, payload, user.id)
+                return user
 
         return None
 
@@ -71,6 +169,14 @@ class UserService:
             return user
         return None  # Return None if authentication fails
 
+    def set_timezone(self, user: User, timezone: str):
+        """Set the IANA timezone whose calendar the user's periods follow, None for the host's timezone."""
+        if timezone is not None and not is_valid_timezone(timezone):
+            raise ValueError("Invalid timezone.")
+        user.timezone = timezone
+        self.session.commit()
+        return user
+
     def update_password(self, email: str, old_password: str, new_password: str):
         """Update the user's password after verifying the old password."""
         user = self.session.query(User).filter(User.email == email).first()
@@ -82,5 +188,6 @@ class UserService:
 
         user.set_password(new_password)  # Hash and update password
         self.session.commit()
+        token_cache.invalidate_user(user.id)
 
         return user
@@ -0,0 +1,63 @@
+"""
+Batch streak engine. Loads the (habit_id, completed, open, length) columns of many habits' task runs in
+one query and computes current and longest streaks for all of them at once with NumPy, using a
+run-length encoding of the completed flags instead of walking ORM objects habit by habit.
+"""
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .models import task_runs_query
+
+def compute_streaks(habit_ids: np.ndarray, completed: np.ndarray, is_open: np.ndarray, lengths: np.ndarray = None):
+    """
+    Compute streaks from task columns sorted by habit and then by period.
+    `is_open` flags tasks whose period has not ended yet, `lengths` is the number of tasks each row stands for
+    (one by default, more for the runs of compacted months). Returns (habit ids, current streaks, longest streaks),
+    with the same semantics as Habit.get_current_streaks and Habit.get_longest_streaks.
+    """
+    habit_ids = np.asarray(habit_ids, dtype=np.int64)
+    completed = np.asarray(completed, dtype=bool)
+    is_open = np.asarray(is_open, dtype=bool)
+    lengths = np.ones(len(habit_ids), dtype=np.int64) if lengths is None else np.asarray(lengths, dtype=np.int64)
+    if len(habit_ids) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    unique_ids, habit_index = np.unique(habit_ids, return_inverse=True)
+
+    # The open task of the current period does not count until it is completed or overdue
+    is_last = np.r_[habit_ids[1:] != habit_ids[:-1], True]
+    keep = ~(is_last & is_open & ~completed)
+    habit_index, completed, lengths = habit_index[keep], completed[keep], lengths[keep]
+
+    current = np.zeros(len(unique_ids), dtype=np.int64)
+    longest = np.zeros(len(unique_ids), dtype=np.int64)
+    if len(habit_index) == 0:
+        return unique_ids, current, longest
+
+    # Run-length encode the completed flags, a run never spans two habits
+    run_starts = np.flatnonzero(np.r_[True, (habit_index[1:] != habit_index[:-1]) | (completed[1:] != completed[:-1])])
+    run_lengths = np.add.reduceat(lengths, run_starts)
+    run_habits = habit_index[run_starts]
+    run_completed = completed[run_starts]
+
+    np.maximum.at(longest, run_habits[run_completed], run_lengths[run_completed])
+
+    # The current streak is the last run of each habit, if it is a completed one
+    last_runs = np.r_[run_habits[1:] != run_habits[:-1], True] & run_completed
+    current[run_habits[last_runs]] = run_lengths[last_runs]
+
+    return unique_ids, current, longest
+
+def load_streaks(db: Session, habit_ids: list = None):
+    """Compute the streaks of the given habits, or of every habit with tasks, from a single query."""
+    runs = task_runs_query(habit_ids).subquery()
+    query = (
+        select(runs.c.habit_id, runs.c.completed, runs.c.end_date >= datetime.now(), runs.c.length)
+        .order_by(runs.c.habit_id, runs.c.start_date, runs.c.seq)
+    )
+    rows = db.execute(query).all()
+
+    columns = np.array(rows, dtype=np.int64).reshape(-1, 4)
+    return compute_streaks(columns[:, 0], columns[:, 1].astype(bool), columns[:, 2].astype(bool), columns[:, 3])
@@ -0,0 +1,53 @@
+"""
+Timezones of the users, as IANA names. Task dates are stored in the host's local time, the periods of a user
+with a timezone follow their local calendar and are converted to host time. Users without a timezone follow
+the host's. The scheduler can roll over the users of each UTC offset when it reaches local midnight.
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import select, distinct
+from sqlalchemy.orm import Session
+from .models import User
+
+# The scheduler checks for local midnights every quarter of an hour, the granularity of UTC offsets.
+# Its first run looks back this far, the next ones back to the previous run.
+MIDNIGHT_WINDOW = timedelta(minutes=15)
+
+@lru_cache(maxsize=None)
+def get_zone(name: str):
+    """The ZoneInfo of a timezone name, None for the host's timezone."""
+    return ZoneInfo(name) if name else None
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        get_zone(name)
+        return bool(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+def local_time(now: datetime, name: str) -> datetime:
+    """The naive local time in timezone `name` at `now`, a naive host time or an aware time."""
+    return now.astimezone(get_zone(name)).replace(tzinfo=None)
+
+def host_time(local: datetime, name: str) -> datetime:
+    """The naive host time of the naive local time `local` in timezone `name`."""
+    return local.replace(tzinfo=get_zone(name)).astimezone().replace(tzinfo=None)
+
+def user_timezones(db: Session) -> list:
+    """The distinct timezones of the users, None for the users without one."""
+    return db.scalars(select(distinct(User.timezone))).all()
+
+def local_midnight_buckets(timezones: list, now: datetime = None, since: datetime = None) -> dict:
+    """
+    Group the timezones whose local day started after `since` and up to `now` by their current UTC offset,
+    one rollover bucket per offset. `since` is the previous rollover, it defaults to MIDNIGHT_WINDOW before `now`.
+    """
+    now = now or datetime.now()
+    since = (since or now - MIDNIGHT_WINDOW).astimezone()
+    buckets = {}
+    for name in timezones:
+        local = now.astimezone(get_zone(name))
+        if since < local.replace(hour=0, minute=0, second=0, microsecond=0) <= local:
+            buckets.setdefault(local.utcoffset(), []).append(name)
+    return buckets
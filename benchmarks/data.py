@@ -0,0 +1,66 @@
+"""Synthetic dataset generator for the benchmarks, built on init_data.generate_task_data."""
+import bcrypt
+from datetime import datetime, timedelta
+from itertools import cycle
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+from app.models import Base, User, Habit, Task
+from app.partitions import create_task_partitions
+from init_data import generate_task_data
+
+HABITS_PER_USER = 10
+PERIODICITIES = ['daily', 'daily', 'daily', 'weekly', 'fortnightly', 'monthly']
+BATCH_SIZE = 10000
+
+def reset_database(db: Session):
+    """Empty every table of the models, caches, rollups and their watermarks included."""
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    db.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    db.commit()
+
+def seed(db: Session, tasks: int, days: int = 365):
+    """
+    Seed roughly `tasks` tasks: habits created `days` ago with the tasks generate_task_data gives
+    for their periodicity, HABITS_PER_USER habits per user. Returns the number of tasks created.
+    """
+    created_at = datetime.now() - timedelta(days=days)
+    # Every habit of a periodicity gets the same history, generate it once
+    task_templates = {periodicity: generate_task_data(periodicity, created_at) for periodicity in set(PERIODICITIES)}
+
+    # Plan the habits needed to reach the number of tasks
+    habits = []
+    planned_tasks = 0
+    periodicities = cycle(PERIODICITIES)
+    while planned_tasks < tasks:
+        periodicity = next(periodicities)
+        habit_tasks = task_templates[periodicity][:tasks - planned_tasks]
+        habits.append((periodicity, habit_tasks))
+        planned_tasks += len(habit_tasks)
+
+    # Hash a single password, bcrypt would dominate the seeding time otherwise
+    password_hash = bcrypt.hashpw(b"Password1@234", bcrypt.gensalt()).decode('utf-8')
+    users_count = (len(habits) + HABITS_PER_USER - 1) // HABITS_PER_USER
+    user_ids = db.scalars(insert(User).returning(User.id, sort_by_parameter_order=True), [
+        {'name': f"User {i + 1}", 'email': f"user{i + 1}@example.com", 'password_hash': password_hash}
+        for i in range(users_count)
+    ]).all()
+    habit_ids = db.scalars(insert(Habit).returning(Habit.id, sort_by_parameter_order=True), [
+        {'name': f"Habit {i % HABITS_PER_USER + 1}", 'periodicity': periodicity,
+         'user_id': user_ids[i // HABITS_PER_USER], 'created_at': created_at}
+        for i, (periodicity, _) in enumerate(habits)
+    ]).all()
+
+    # Yearly periods start on January 1st, the earliest a task can start
+    create_task_partitions(db, datetime(created_at.year, 1, 1), datetime.now())
+    batch = []
+    for habit_id, (_, habit_tasks) in zip(habit_ids, habits):
+        batch.extend({**task_data, 'habit_id': habit_id} for task_data in habit_tasks)
+        if len(batch) >= BATCH_SIZE:
+            db.execute(insert(Task), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Task), batch)
+
+    db.execute(text("ANALYZE users, habits, tasks"))
+    db.commit()
+    return planned_tasks
@@ -0,0 +1,132 @@
+"""
+Benchmarks for the hot paths at increasing dataset sizes. Every scale reseeds the database, so
+point --database-url at a dedicated database. Results are written as JSON to compare runs.
+
+    python -m benchmarks.run --scales 1000,100000,1000000 --output bench_results.json
+"""
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+import click
+from sqlalchemy import create_engine, select, func, text
+from sqlalchemy.orm import sessionmaker
+from app.config import config
+from app.database import SessionLocal
+from app.models import User, Habit, Task
+from app.analytics import get_leaderboard, get_user_longest_streak, get_habits_struggled_most_last_period
+from app.services.task_service import TaskService
+from app.services.user_service import UserService
+from benchmarks.data import reset_database, seed
+import scheduler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure(run, repeat: int, setup=None):
+    """Time `run` `repeat` times, calling `setup` untimed before each run. Returns the timings in seconds."""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            run()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def summarize(name: str, scale: int, tasks: int, timings: list) -> dict:
+    return {
+        'benchmark': name,
+        'scale': scale,
+        'tasks': tasks,
+        'runs': timings,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+    }
+
+def make_due(db, last_seeded_task_id: int):
+    """End every open period so the rollover has work to do, and drop the tasks a previous rollover created."""
+    db.execute(text("DELETE FROM tasks WHERE id > :last_id"), {'last_id': last_seeded_task_id})
+    db.execute(text("UPDATE tasks SET end_date = now() - interval '1 second' WHERE end_date >= now()"))
+    db.commit()
+
+def run_cli(*args, env=None):
+    subprocess.run([sys.executable, os.path.join(ROOT, 'client.py'), *args], env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def benchmark_scale(db, scale: int, days: int, repeat: int, database_url: str) -> list:
+    reset_database(db)
+    tasks = seed(db, scale, days)
+    last_seeded_task_id = db.scalar(select(func.max(Task.id)))
+    user = db.scalars(select(User).order_by(User.id).limit(1)).first()
+    token = UserService(db).get_auth_token(user.email, user.id)
+    results = []
+
+    def record(name, timings):
+        results.append(summarize(name, scale, tasks, timings))
+        click.echo(f"  {name}: median {results[-1]['median'] * 1000:.1f} ms")
+
+    record('get_leaderboard', measure(lambda: get_leaderboard(db), repeat))
+    record('get_leaderboard_vectorized', measure(lambda: get_leaderboard(db, vectorized=True), repeat))
+    record('get_user_longest_streak', measure(lambda: get_user_longest_streak(user), repeat, setup=db.expire_all))
+    record('get_habits_struggled_most_last_period',
+           measure(lambda: get_habits_struggled_most_last_period(db, user.id, 'daily'), repeat))
+
+    # Complete a different open task on every run
+    open_tasks = db.execute(
+        select(Task.id, Habit.user_id).join(Habit).where(Task.completed == False, Task.end_date >= func.now()).limit(repeat)
+    ).all()
+    task_service = TaskService(db)
+    pending = iter(open_tasks)
+
+    def complete_next_task():
+        task_id, user_id = next(pending)
+        task_service.complete_task(user_id, task_id)
+
+    if open_tasks:
+        record('complete_task', measure(complete_next_task, len(open_tasks)))
+
+    record('create_new_task_for_habits',
+           measure(scheduler.create_new_task_for_habits, 1, setup=lambda: make_due(db, last_seeded_task_id)))
+    record('create_new_task_for_habits_in_bulk',
+           measure(scheduler.create_new_task_for_habits_in_bulk, 1, setup=lambda: make_due(db, last_seeded_task_id)))
+
+    env = {**os.environ, 'DATABASE_URL': database_url, 'TEST_DATABASE_URL': database_url}
+    record('cli --help', measure(lambda: run_cli('--help', env=env), repeat))
+    record('cli leaderboard', measure(lambda: run_cli('leaderboard', env=env), repeat))
+    record('cli show-current-streaks', measure(lambda: run_cli('show-current-streaks', '--token', token, env=env), repeat))
+    return results
+
+@click.command()
+@click.option('--scales', default='1000,10000,100000', help='Comma separated numbers of tasks to seed, up to 10000000.')
+@click.option('--days', default=365, help='Days of history per habit.')
+@click.option('--repeat', default=5, help='Runs per benchmark.')
+@click.option('--database-url', default=lambda: os.environ.get('BENCH_DATABASE_URL') or config.TEST_DATABASE_URL,
+              help='Database to seed, it is emptied first.')
+@click.option('--output', default='bench_results.json', help='JSON file to write the results to.')
+def main(scales: str, days: int, repeat: int, database_url: str, output: str):
+    engine = create_engine(database_url, **config.engine_options(url=database_url))
+    # The scheduler jobs open their own sessions through SessionLocal
+    SessionLocal.configure(bind=engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+
+    git_commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    report = {'started_at': datetime.now().isoformat(), 'git_commit': git_commit, 'days': days, 'repeat': repeat, 'results': []}
+    for scale in [int(scale) for scale in scales.split(',')]:
+        click.echo(f"Benchmarking {scale} tasks...")
+        report['results'].extend(benchmark_scale(db, scale, days, repeat, database_url))
+        # Write after every scale so a long run still leaves results behind
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    db.close()
+    click.echo(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Startup time of every CLI command. Each command runs with --help in a fresh interpreter, which
+measures the imports done before a command talks to the database. Fails when a command's median
+exceeds --max-ms, so it can run in CI without a database.
+
+    python -m benchmarks.startup --repeat 10 --max-ms 250
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import click
+from client import cli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('sqlalchemy', 'bcrypt', 'jsonwebtoken', 'app.database', 'app.analytics')
+
+def time_command(args: list, repeat: int) -> list:
+    """Time `client.py *args` in a new interpreter `repeat` times. Returns the timings in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, 'client.py'), *args], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def heavy_modules_loaded() -> list:
+    """Heavy modules that importing the CLI loads, these should only be imported by the commands using them."""
+    code = f"import sys, client; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return [module for module in output.strip().split(',') if module]
+
+@click.command()
+@click.option('--repeat', default=5, help='Runs per command.')
+@click.option('--max-ms', default=None, type=float, help='Fail when a command median is above this many milliseconds.')
+@click.option('--output', default=None, help='JSON file to write the results to.')
+def main(repeat: int, max_ms: float, output: str):
+    results = []
+    for args in [['--help']] + [[name, '--help'] for name in sorted(cli.commands)]:
+        timings = time_command(args, repeat)
+        results.append({'command': ' '.join(args), 'runs': timings, 'min': min(timings), 'median': statistics.median(timings)})
+        click.echo(f"  {' '.join(args)}: median {results[-1]['median'] * 1000:.1f} ms")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'repeat': repeat, 'results': results}, f, indent=2)
+
+    failed = False
+    loaded = heavy_modules_loaded()
+    if loaded:
+        click.echo(f"Importing the CLI loads {', '.join(loaded)}")
+        failed = True
+    slow = [result['command'] for result in results if max_ms is not None and result['median'] * 1000 > max_ms]
+    if slow:
+        click.echo(f"Slower than {max_ms} ms: {', '.join(slow)}")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
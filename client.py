@@ -1,12 +1,7 @@
 import click
-from app.services.habit_service import HabitService
-from app.services.task_service import TaskService
-from app.services.user_service import UserService
-from app.database import SessionLocal
-from app.analytics import (
-    get_leaderboard, get_user_longest_streak,
-    get_current_habits_for_period, get_habits_struggled_most_last_period, get_current_habits
-)
+import re
+# SQLAlchemy, bcrypt, the services and the analytics are imported inside the commands that use them,
+# so --help and input validation don't pay for loading them or for creating the engine
 from validation import (
     validate_create_habit, validate_register, validate_login,
     validate_update_password, is_number, is_valid_periodicity
@@ -14,18 +9,48 @@ from validation import (
 
 # Dependency to get the DB session
 def get_db():
+    from app.database import SessionLocal
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
-@click.group("habit-tracker")
+class DaemonCommand(click.Command):
+    """Runs the command in the daemon when one is listening, once click has parsed and prompted for the options."""
+
+    def invoke(self, ctx):
+        from daemon import forward
+        response = forward(self.name, ctx.params)
+        if response is None:
+            return super().invoke(ctx)
+        click.echo(response['output'], nl=False)
+        ctx.exit(response['exit_code'])
+
+class DaemonGroup(click.Group):
+    command_class = DaemonCommand
+
+@click.group("habit-tracker", cls=DaemonGroup)
 def cli():
     """Habit Tracker CLI"""
     pass
 
+class TaskIdsFile(click.ParamType):
+    """A file of task IDs separated by spaces, commas or new lines, - for stdin. Read when the options are parsed."""
+    name = "file"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, (list, tuple)):
+            return tuple(value)  # Already read, e.g. before being sent to the daemon
+        with click.open_file(value) as file:
+            tokens = [token for token in re.split(r'[\s,]+', file.read()) if token]
+        invalid = [token for token in tokens if not token.isdigit()]
+        if invalid:
+            self.fail(f"{invalid[0]!r} is not a valid task ID.", param, ctx)
+        return tuple(int(token) for token in tokens)
+
 def get_user_from_token(db, token: str):
+    from app.services.user_service import UserService
     userService = UserService(db)
     return userService.get_user_from_token(token)
 
@@ -39,6 +64,7 @@ def register(name: str, email: str, password: str):
         click.echo("Invalid input")
         return
 
+    from app.services.user_service import UserService
     db = next(get_db())
     user_service = UserService(db)
     
@@ -50,6 +76,22 @@ def register(name: str, email: str, password: str):
     finally:
         db.close()
 
+# Command to register many users from a CSV (name,email,password header) or JSONL file
+@cli.command("import-users")
+@click.option("--file", "path", prompt="Users file", type=click.Path(exists=True, dir_okay=False, resolve_path=True), help="CSV or JSONL file of users")
+@click.option("--batch-size", default=1000, show_default=True, help="Users inserted per statement")
+@click.option("--workers", type=int, default=None, help="Password hashing processes (defaults to the CPU count)")
+def import_users(path: str, batch_size: int, workers: int):
+    from app.services.user_import import read_user_records
+    from app.services.user_service import UserService
+    db = next(get_db())
+    user_service = UserService(db)
+    result = user_service.import_users(read_user_records(path), batch_size, workers)
+    click.echo(f"{result.created} users imported, {len(result.failures)} failed.")
+    for line, email, error in result.failures:
+        click.echo(f"Line {line} ({email}): {error}")
+    db.close()
+
 # Command to login a user
 @cli.command("login")
 @click.option('--email', prompt='Your email', help='The email of the user.')
@@ -59,6 +101,7 @@ def login(email: str, password: str):
         click.echo("Invalid input")
         return
 
+    from app.services.user_service import UserService
     db = next(get_db())
     user_service = UserService(db)
     
@@ -66,7 +109,7 @@ def login(email: str, password: str):
     if user:
         click.echo(f"Login successful! Welcome back, {user.name}.")
         click.echo(f"Your email is: {user.email}")
-        token = user_service.get_auth_token(user.email)
+        token = user_service.get_auth_token(user.email, user.id)
         click.echo(f"Your token is: {token}")
     else:
         click.echo("Invalid credentials. Please try again.")
@@ -82,6 +125,7 @@ def update_password(email: str, old_password: str, new_password: str):
         click.echo("Invalid input")
         return
 
+    from app.services.user_service import UserService
     db = next(get_db())
     user_service = UserService(db)
 
@@ -92,6 +136,26 @@ def update_password(email: str, old_password: str, new_password: str):
         click.echo(f"Error: {e}")
     db.close()
 
+# Command to set the timezone whose calendar the periods of the user follow
+@cli.command("set-timezone")
+@click.option('--token', prompt='Token', help='The auth token of the user.')
+@click.option('--timezone', prompt='Timezone', help='The IANA timezone of the user, e.g. Europe/Berlin.')
+def set_timezone(token: str, timezone: str):
+    from app.services.user_service import UserService
+    db = next(get_db())
+    user_service = UserService(db)
+    user = user_service.get_user_from_token(token)
+    if not user:
+        click.echo("User not found!")
+        return
+
+    try:
+        user_service.set_timezone(user, timezone.strip())
+        click.echo(f"Timezone of user {user.name} set to {user.timezone}. New tasks follow its calendar.")
+    except ValueError as e:
+        click.echo(f"Error: {e}")
+    db.close()
+
 # Command to create a new habit
 @cli.command("create-habit")
 @click.option('--token', prompt='Token', help='The auth token of the user.')
@@ -102,6 +166,7 @@ def create_habit(token: str, name: str, periodicity: str):
         click.echo("Invalid Input")
         return
 
+    from app.services.habit_service import HabitService
     db = next(get_db())
     habit_service = HabitService(db)
     user = get_user_from_token(db, token)
@@ -111,7 +176,7 @@ def create_habit(token: str, name: str, periodicity: str):
 
     habit = habit_service.create_habit(user=user, name=name, periodicity=periodicity.lower())
     click.echo(f"Habit {name} created for user {user.name}.")
-    task = habit.tasks[0]
+    task = habit.get_latest_task()
     click.echo(f"A new task has been created for the habit with the description {task.description} with start date {task.start_date.isoformat()} and end date {task.end_date.isoformat()}")
     db.close()
 
@@ -125,6 +190,7 @@ def update_habit(token: str, name: str, habit_id: int):
         click.echo("Invalid Input")
         return
 
+    from app.services.habit_service import HabitService
     db = next(get_db())
     habit_service = HabitService(db)
     user = get_user_from_token(db, token)
@@ -146,6 +212,7 @@ def update_habit(token: str, name: str, habit_id: int):
 @cli.command("list-habits")
 @click.option('--token', prompt='Token', help='The auth token of the user.')
 def list_habits(token: str):
+    from app.services.habit_service import HabitService
     db = next(get_db())
     user = get_user_from_token(db, token)
     if not user:
@@ -159,16 +226,33 @@ def list_habits(token: str):
         click.echo(f"{habit.id}. {habit.name} ({habit.periodicity})")
     db.close()
 
+def format_task(task) -> str:
+    status = "Completed" if task.completed else "Pending"
+    message = f"{task.id}. {task.description} - {status}, start at {task.start_date.isoformat()} - end at {task.end_date.isoformat()}."
+    if task.completed:
+        message += f" Completed at {task.completed_at.isoformat()}"
+    return message
+
+def format_task_summary(summary) -> str:
+    return (f"{summary.period_start.strftime('%Y-%m')}. Compacted month - {summary.completed_count} completed, "
+            f"{summary.missed_count} missed, end at {summary.period_end.isoformat()}.")
+
 # Command to list tasks for a habit
 @cli.command("list-tasks")
 @click.option('--token', prompt='Token', help='The auth token of the user.')
 @click.option('--habit_id', prompt='Habit ID', help='The ID of the habit.', type=int)
-def list_tasks(token: str, habit_id: int):
+@click.option('--limit', type=int, default=None, help='The maximum number of tasks to list.')
+@click.option('--after-id', type=int, default=None, help='List the tasks after this task, to continue a previous listing.')
+@click.option('--since', type=click.DateTime(), default=None, help='Only list tasks starting on or after this date.')
+@click.option('--order', type=click.Choice(['asc', 'desc']), default='asc', show_default=True, help='Order by start date.')
+def list_tasks(token: str, habit_id: int, limit: int, after_id: int, since, order: str):
     if not is_number(habit_id):
         click.echo("Habit ID must be an number!")
         click.echo("Invalid input")
         return
 
+    from app.services.habit_service import HabitService
+    from app.services.task_service import TaskService
     db = next(get_db())
     user = get_user_from_token(db, token)
     if not user:
@@ -181,20 +265,32 @@ def list_tasks(token: str, habit_id: int):
         click.echo("Habit not found!")
         return
 
-    tasks = habit.get_tasks()
-    if len(tasks) == 0:
+    task_service = TaskService(db)
+    descending = order == 'desc'
+
+    def task_lines():
+        # Compacted months are listed as one line each and don't count towards --limit: all of them on the first
+        # page in ascending order, on the page where the tasks run out in descending order
+        summaries = task_service.list_task_summaries(habit.id, since, descending)
+        if not descending and after_id is None:
+            yield from map(format_task_summary, summaries)
+        # Tasks are printed as they are fetched, a batch at a time
+        listed = 0
+        for task in task_service.list_tasks(habit.id, limit, after_id, since, descending):
+            listed += 1
+            yield format_task(task)
+        if descending and (limit is None or listed < limit):
+            yield from map(format_task_summary, summaries)
+
+    count = 0
+    for line in task_lines():
+        if count == 0:
+            click.echo(f"Tasks for habit {habit.name}:")
+        count += 1
+        click.echo(line)
+
+    if count == 0:
         click.echo(f"No tasks found for habit {habit.name}.")
-    else:
-        click.echo(f"Tasks for habit {habit.name}:")
-        for task in tasks:
-            status = "Completed" if task.completed else "Pending"
-            start_date = task.start_date.isoformat()
-            end_date = task.end_date.isoformat()
-            message = f"{task.id}. {task.description} - {status}, start at {start_date} - end at {end_date}."
-            if status == "Completed":
-                message += f" Completed at {task.completed_at.isoformat()}"
-            click.echo(message)
-
     db.close()
 
 # Command to mark a task as completed
@@ -207,6 +303,7 @@ def complete_task(token: str, task_id: int):
         click.echo("Invalid input")
         return
 
+    from app.services.task_service import TaskService
     db = next(get_db())
     user = get_user_from_token(db, token)
     if not user:
@@ -223,10 +320,36 @@ def complete_task(token: str, task_id: int):
     
     db.close()
 
+# Command to mark many tasks as completed at once
+@cli.command("complete-tasks")
+@click.option('--token', prompt='Token', help='The auth token of the user.')
+@click.option('--file', 'file_task_ids', type=TaskIdsFile(), default=None, help='A file of task IDs separated by spaces, commas or new lines, - for stdin.')
+@click.argument('task_ids', nargs=-1, type=int)
+def complete_tasks(token: str, file_task_ids, task_ids):
+    task_ids = [*task_ids, *(file_task_ids or ())]
+    if not task_ids:
+        click.echo("No task IDs given, pass them as arguments or with --file.")
+        return
+
+    from app.services.task_service import TaskService
+    db = next(get_db())
+    user = get_user_from_token(db, token)
+    if not user:
+        click.echo("User not found!")
+        return
+
+    results = TaskService(db).complete_tasks(user.id, task_ids)
+    failed = sum(1 for error in results.values() if error)
+    click.echo(f"{len(results) - failed} tasks completed, {failed} failed.")
+    for task_id, error in results.items():
+        click.echo(f"Task {task_id}: {error or 'Completed'}")
+    db.close()
+
 # Command to show analytics
 @cli.command("show-current-streaks")
 @click.option('--token', prompt='Token', help='The auth token of the user.')
 def show_current_streaks(token: str):
+    from app.services.habit_service import HabitService
     db = next(get_db())
     user = get_user_from_token(db, token)
     if not user:
@@ -253,6 +376,7 @@ def show_current_streaks(token: str):
 @cli.command("longest-streak")
 @click.option('--token', prompt='Token', help='The auth token of the user.')
 def longest_streak(token: str):
+    from app.analytics import get_user_longest_streak
     db = next(get_db())
     user = get_user_from_token(db, token)
     if not user:
@@ -276,6 +400,7 @@ def longest_streak(token: str):
 @click.option('--token', prompt='Token', help='The auth token of the user.')
 @click.option('--habit_id', prompt='Habit ID', help='The ID of the habit.', type=int)
 def longest_streak_for_habit(token: str, habit_id: int):
+    from app.services.habit_service import HabitService
     db = next(get_db())
     user = get_user_from_token(db, token)
     if not user:
@@ -288,7 +413,7 @@ def longest_streak_for_habit(token: str, habit_id: int):
         click.echo("Habit not found")
         return
 
-    streak = habit.get_longest_streaks()
+    streak = habit_service.get_longest_streaks(habit)
     if streak == 0:
         click.echo(f"No streaks found for user {user.name} for habit {habit.name}.")
         return
@@ -299,6 +424,7 @@ def longest_streak_for_habit(token: str, habit_id: int):
 @cli.command("current-habits")
 @click.option('--token', prompt='Token', help='The auth token of the user.')
 def current_habits(token: str):
+    from app.analytics import get_current_habits
     db = next(get_db())
     user = get_user_from_token(db, token)
     if not user:
@@ -312,7 +438,7 @@ def current_habits(token: str):
 
     click.echo(f"Current habits for user {user.name}:")
     for habit in habits:
-        click.echo(f"{habit.id}. {habit.name} with a periodicity of {habit.periodicity} with a current streak of {habit.get_current_streaks()} days")
+        click.echo(f"{habit.id}. {habit.name} with a periodicity of {habit.periodicity} with a current streak of {habit.current_streak} days")
 
     db.close()
 
@@ -325,6 +451,7 @@ def current_habits_for_period(token: str, period: str):
         click.echo("Invalid period. Please provide a valid period (daily, weekly, forthnightly, monthly, quarterly, bianually, yearly)")
         return
 
+    from app.analytics import get_current_habits_for_period
     db = next(get_db())
     user = get_user_from_token(db, token)
     if not user:
@@ -338,7 +465,7 @@ def current_habits_for_period(token: str, period: str):
 
     click.echo(f"Current habits for user {user.name} for {period} period:")
     for habit in habits:
-        click.echo(f"{habit.id}. {habit.name} with a current streak of {habit.get_current_streaks()} days")
+        click.echo(f"{habit.id}. {habit.name} with a current streak of {habit.current_streak} days")
 
     db.close()
 
@@ -351,6 +478,7 @@ def delete_habit(token: str, habit_id: int):
         click.echo("Invalid input")
         return
 
+    from app.services.habit_service import HabitService
     db = next(get_db())
     user = get_user_from_token(db, token)
     if not user:
@@ -371,21 +499,38 @@ def delete_habit(token: str, habit_id: int):
         db.rollback()
     db.close()
 
+def prompt_period_unless_all_periods(ctx, param, value):
+    # The period is only needed, and prompted for, without --all-periods
+    if value is None and not ctx.params.get('all_periods'):
+        return click.prompt('Period')
+    return value
+
 # Command to show the habits struggled most in the last period
 @cli.command("struggled-habits")
 @click.option('--token', prompt='Token', help='The auth token of the user.')
-@click.option('--period', prompt='Period', help='The period to check habits for (daily, weekly, etc.).')
-def struggled_habits(token: str, period: str):
-    if not is_valid_periodicity(period):
+@click.option('--all-periods', is_flag=True, default=False, is_eager=True, help='Report the last interval of every periodicity.')
+@click.option('--period', callback=prompt_period_unless_all_periods, help='The period to check habits for (daily, weekly, etc.).')
+def struggled_habits(token: str, all_periods: bool, period: str):
+    if not all_periods and not is_valid_periodicity(period):
         click.echo("Invalid period. Please provide a valid period (daily, weekly, forthnightly, monthly, quarterly, bianually, yearly)")
         return
 
+    from app.analytics import get_habits_struggled_most_last_period, get_habits_struggled_most_all_periods
     db = next(get_db())
     user = get_user_from_token(db, token)
     if not user:
         click.echo("User not found!")
         return
 
+    if all_periods:
+        rows = get_habits_struggled_most_all_periods(db, user.id)
+        if not rows:
+            click.echo("No struggled habits found for any period.")
+        for row in rows:
+            click.echo(f"{row.period}: {row.name} - {row.missed_tasks} missed")
+        db.close()
+        return
+
     try:
         habits = get_habits_struggled_most_last_period(db, user.id, period)
         if not habits:
@@ -403,13 +548,72 @@ def struggled_habits(token: str, period: str):
 # Command to show the leaderboard
 @cli.command("leaderboard")
 def leaderboard():
+    from app.analytics import get_leaderboard
     db = next(get_db())
-    leaderboard = get_leaderboard(db)
+    leaderboard = get_leaderboard(db, cached=True)
     click.echo("Leaderboard (Top Streaks):")
     for rank, (user_name, habit_name, streak) in enumerate(leaderboard, 1):
         click.echo(f"{rank}. {user_name} - Streak: {streak} days for habit {habit_name}")
 
     db.close()
 
+# Command to show the daily activity of the user
+@cli.command("activity")
+@click.option('--token', prompt='Token', help='The auth token of the user.')
+@click.option('--days', type=click.IntRange(min=1), default=7, show_default=True, help='Number of days to show, today included.')
+@click.option('--refresh', is_flag=True, default=False, help='Bring the daily rollups up to date first.')
+def activity(token: str, days: int, refresh: bool):
+    from app.analytics import get_user_activity
+    db = next(get_db())
+    user = get_user_from_token(db, token)
+    if not user:
+        click.echo("User not found!")
+        return
+
+    if refresh:
+        from app.rollups import refresh_user_daily_stats
+        refresh_user_daily_stats(db)
+    rows = get_user_activity(db, user.id, days)
+    if not rows:
+        click.echo(f"No activity in the last {days} days.")
+    for day, completed, missed, active_habits in rows:
+        click.echo(f"{day.isoformat()}: {completed} completed, {missed} missed, {active_habits} active habits")
+    db.close()
+
+# Command to rebuild the stored streak counters from the task history
+@cli.command("recompute-streaks")
+def recompute_streaks():
+    from app.services.habit_service import HabitService
+    db = next(get_db())
+    habit_service = HabitService(db)
+    count = habit_service.recompute_streaks()
+    click.echo(f"Streaks recomputed for {count} habits.")
+    db.close()
+
+# Command to compact old task history into monthly summaries
+@cli.command("compact-tasks")
+@click.option('--horizon-days', type=int, default=365, show_default=True, help='Compact the months of tasks older than this many days.')
+def compact_tasks(horizon_days: int):
+    from app.compaction import compact_tasks
+    db = next(get_db())
+    tasks, summaries = compact_tasks(db, horizon_days)
+    click.echo(f"{tasks} tasks compacted into {summaries} monthly summaries.")
+    db.close()
+
+# Command to take old months of tasks out of the tasks table
+@cli.command("detach-task-partitions")
+@click.option('--before', prompt='Before', type=click.DateTime(), help='Detach the months of tasks ending on or before this date.')
+@click.option('--drop', is_flag=True, default=False, help='Delete the detached tasks instead of keeping them as tables.')
+def detach_task_partitions(before, drop: bool):
+    from app.partitions import detach_task_partitions
+    db = next(get_db())
+    detached = detach_task_partitions(db, before, drop)
+    if not detached:
+        click.echo(f"No task partitions end before {before.date().isoformat()}.")
+    else:
+        action = "dropped" if drop else "detached"
+        click.echo(f"Task partitions {action}: {', '.join(detached)}")
+    db.close()
+
 if __name__ == "__main__":
     cli()
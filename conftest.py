@@ -1,7 +1,7 @@
 import os
 import pytest
 from app.database import SessionLocal, init_db
-from app.models import User, Habit, Task
+from app.models import User, Habit, Task, LeaderboardState
 from app.services.habit_service import HabitService
 from app.services.user_service import UserService
 from app.services.util import compute_start_and_end_date
@@ -44,6 +44,7 @@ def delete_db_data(db_session):
     db_session.query(Task).delete()
     db_session.query(Habit).delete()
     db_session.query(User).delete()
+    db_session.query(LeaderboardState).delete()
     db_session.commit()
 
 
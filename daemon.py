@@ -0,0 +1,150 @@
+"""
+Optional background process that runs CLI commands with a warm engine, connection pool and token cache.
+It listens on a Unix domain socket, client.py sends commands to it when it is running and runs them
+in-process otherwise.
+
+    python daemon.py
+"""
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+
+# Read straight from the environment, app.config would make every CLI run import SQLAlchemy
+SOCKET_PATH = os.environ.get('DAEMON_SOCKET') or os.path.join(tempfile.gettempdir(), f'habit-tracker-{os.getuid()}.sock')
+
+# The variables selecting the database. A CLI run that sets them differently from the daemon runs in-process.
+DATABASE_ENVIRONMENT = ('ENV', 'DATABASE_URL', 'TEST_DATABASE_URL')
+
+def database_environment() -> dict:
+    """The variables of DATABASE_ENVIRONMENT set in this process."""
+    return {name: os.environ[name] for name in DATABASE_ENVIRONMENT if name in os.environ}
+
+def forward(command: str, params: dict, socket_path: str = None):
+    """
+    Run a command in the daemon. Returns its {output, exit_code}, or None when no daemon is listening or
+    it runs on another database than this process would.
+    """
+    socket_path = socket_path or SOCKET_PATH
+    if not os.path.exists(socket_path):
+        return None
+    request = {'command': command, 'params': params, 'environment': database_environment()}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request, default=str).encode('utf-8') + b'\n')
+            sock.shutdown(socket.SHUT_WR)
+            response = sock.makefile('rb').readline()
+    except (ConnectionRefusedError, FileNotFoundError):
+        return None  # Stale socket left behind by a daemon that died
+    response = json.loads(response) if response else None
+    return None if response is None or 'rejected' in response else response
+
+def environment_mismatch(environment: dict, daemon_environment: dict):
+    """The first variable the CLI set to another value than the daemon's, None when they agree."""
+    for name, value in environment.items():
+        if daemon_environment.get(name, 'development' if name == 'ENV' else None) != value:
+            return name
+    return None
+
+def run_command(command: str, params: dict) -> dict:
+    """Run a CLI command callback with already parsed params, capturing what it prints."""
+    import click
+    from sqlalchemy import event
+    from app.database import SessionLocal
+    from client import cli
+
+    click_command = cli.get_command(None, command)
+    if click_command is None:
+        return {'output': f"Error: No such command '{command}'.\n", 'exit_code': 2}
+
+    # Commands can return early without closing their session, track them to hand the connections back to the pool
+    sessions = []
+    track_session = lambda session, transaction, connection: sessions.append(session)
+    event.listen(SessionLocal, 'after_begin', track_session)
+
+    output = io.StringIO()
+    exit_code = 0
+    with redirect_stdout(output), redirect_stderr(output):
+        try:
+            with click.Context(click_command, info_name=command) as ctx:
+                # Values like dates were sent as strings, convert them back with the option types
+                for param in click_command.params:
+                    if params.get(param.name) is not None:
+                        params[param.name] = param.type_cast_value(ctx, params[param.name])
+                ctx.invoke(click_command.callback, **params)
+        except click.exceptions.Exit as e:
+            exit_code = e.exit_code
+        except click.ClickException as e:
+            e.show()
+            exit_code = e.exit_code
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            event.remove(SessionLocal, 'after_begin', track_session)
+            for session in sessions:
+                session.close()
+    return {'output': output.getvalue(), 'exit_code': exit_code}
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        mismatch = environment_mismatch(request.get('environment', {}), self.server.environment)
+        if mismatch:
+            response = {'rejected': f"The daemon runs with another {mismatch}."}
+        else:
+            response = run_command(request['command'], request['params'])
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+def is_listening(socket_path: str) -> bool:
+    """Check whether a daemon is accepting connections on the socket."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+def create_server(socket_path: str = None) -> socketserver.UnixStreamServer:
+    """
+    Bind the daemon socket, readable by the current user only since commands carry auth tokens.
+    Commands run one at a time because their output is captured by redirecting stdout. The database
+    environment is recorded when the server is created, after app.config loaded .env.
+    """
+    socket_path = socket_path or SOCKET_PATH
+    if is_listening(socket_path):
+        raise RuntimeError(f"A daemon is already listening on {socket_path}")
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    old_umask = os.umask(0o177)
+    try:
+        server = socketserver.UnixStreamServer(socket_path, CommandHandler)
+    finally:
+        os.umask(old_umask)
+    server.environment = database_environment()
+    return server
+
+if __name__ == "__main__":
+    from app.config import config
+    from app.database import configure_engine
+    # Load what the commands import lazily up front, so the first command is as fast as the rest
+    import app.analytics, app.services.habit_service, app.services.task_service, app.services.user_service
+
+    # Commands run one at a time, they only need one connection
+    configure_engine(config.DAEMON_POOL_SIZE)
+    server = create_server()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Daemon listening on {SOCKET_PATH}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(SOCKET_PATH)
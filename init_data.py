@@ -1,6 +1,10 @@
+import click
 from datetime import datetime, timedelta
 from random import randint
 from app.database import SessionLocal, init_db
+from app.bulk_loader import seed_bulk
+from app.partitions import create_task_partitions
+from app.leaderboard import invalidate_leaderboard
 from app.services.user_service import UserService
 from app.services.habit_service import HabitService
 
@@ -25,6 +29,8 @@ def create_initial_data():
         print("Initial data already exists. Skipping creation.")
         return
 
+    # Partitions for the sample history, which starts 4 weeks ago
+    create_task_partitions(db, datetime.now() - timedelta(weeks=5), datetime.now())
     for user_data in users_data:
         user = user_service.register(user_data["name"], user_data["email"], user_data["password"])
 
@@ -54,6 +60,9 @@ def create_initial_data():
                 task.completed_at = task_data["completed_at"]
                 db.add(task)
 
+            habit.recompute_streaks()
+
+    invalidate_leaderboard(db)
     db.commit()
     db.close()
     print("Initial data created successfully!")
@@ -137,11 +146,29 @@ def generate_task_data(periodicity: str, created_at: datetime):
     return tasks_data
 
 # Run the function to add initial data
-if __name__ == "__main__":
+def create_bulk_data(users: int, habits: int, days: int):
+    """Seed a large dataset through COPY, see app.bulk_loader.seed_bulk."""
+    db = SessionLocal()
+    counts = seed_bulk(db, users, habits, days)
+    db.close()
+    print(f"Created {counts['users']} users, {counts['habits']} habits and {counts['tasks']} tasks.")
+
+@click.command()
+@click.option('--bulk', is_flag=True, help='Seed a large dataset with COPY instead of the sample data.')
+@click.option('--users', default=1000, help='Number of users to create in bulk mode.')
+@click.option('--habits', default=10, help='Number of habits per user in bulk mode.')
+@click.option('--days', default=365, help='Days of task history per habit in bulk mode.')
+def main(bulk: bool, users: int, habits: int, days: int):
     # Initialize the database
     init_db()
 
-    # Create initial data
-    create_initial_data()
+    if bulk:
+        create_bulk_data(users, habits, days)
+    else:
+        # Create initial data
+        create_initial_data()
+
+if __name__ == "__main__":
+    main()
 
 
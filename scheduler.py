@@ -1,25 +1,97 @@
 import time
+from datetime import datetime
 import schedule
 from app.services.habit_service import HabitService
-from app.database import SessionLocal, init_db
+from app.database import SessionLocal, init_db, configure_engine
+from app.config import config
+from app.partitions import create_future_task_partitions
+from app.compaction import compact_tasks
+from app.rollups import refresh_user_daily_stats
+from app.timezones import user_timezones, local_midnight_buckets
 
 def create_new_task_for_habits():
-    """Scheduled task to create a new task for all habits."""
+    """Scheduled task to create a new task for the habits whose current period has ended."""
+    if config.BULK_ROLLOVER:
+        return create_new_task_for_habits_in_bulk()
+
+    # Every habit gets the period of the same instant, whose boundaries the calendar computes once
+    now = datetime.now()
     db = SessionLocal()
     habit_service = HabitService(db)
-    habits = habit_service.get_all_habits()
+    habits = habit_service.get_due_habits(now)
     for habit in habits:
-        task = habit_service.add_task(habit, False)
+        task = habit_service.add_task(habit, False, now)
         print(f"New task created for habit {habit.name} with periodicity {habit.periodicity}")
 
     db.commit()
     db.close()
 
-# Schedule the task to run at midnight every day (host machine timezone)
-schedule.every().day.at("00:00").do(create_new_task_for_habits)
+def create_new_task_for_habits_in_bulk():
+    """Scheduled task to create a new task for the habits whose current period has ended, with set-based inserts."""
+    db = SessionLocal()
+    habit_service = HabitService(db)
+    created = habit_service.add_tasks_for_due_habits(config.ROLLOVER_CHUNK_SIZE, datetime.now())
+    print(f"{created} new tasks created")
+    db.close()
+
+# Time of the previous timezone rollover. Jobs run one at a time, so a run can start late: it rolls over
+# every timezone whose midnight passed since, rolling a bucket over twice is harmless as only due habits get a task
+last_timezone_rollover = None
+
+def create_new_task_for_timezones():
+    """Scheduled task to create a new task for the habits of the users whose local day started since the last run."""
+    global last_timezone_rollover
+    now = datetime.now()
+    db = SessionLocal()
+    habit_service = HabitService(db)
+    buckets = local_midnight_buckets(user_timezones(db), now, last_timezone_rollover)
+    for offset, timezones in sorted(buckets.items()):
+        created = habit_service.add_tasks_for_due_habits(config.ROLLOVER_CHUNK_SIZE, now, timezones)
+        print(f"{created} new tasks created for UTC{offset.total_seconds() / 3600:+g}")
+    last_timezone_rollover = now
+    db.close()
+
+def create_task_partitions():
+    """Scheduled task to create the partitions of the tasks table before new periods need them."""
+    db = SessionLocal()
+    created = create_future_task_partitions(db, config.TASK_PARTITION_MONTHS_AHEAD)
+    if created:
+        print(f"Task partitions created: {', '.join(created)}")
+    db.close()
+
+def compact_old_tasks():
+    """Scheduled task to compact the task history older than the configured horizon."""
+    db = SessionLocal()
+    tasks, summaries = compact_tasks(db, config.COMPACTION_HORIZON_DAYS)
+    print(f"{tasks} tasks compacted into {summaries} monthly summaries")
+    db.close()
+
+def refresh_rollups():
+    """Scheduled task to update the daily analytics rollups of the users whose tasks changed since the last run."""
+    db = SessionLocal()
+    users = refresh_user_daily_stats(db)
+    print(f"Daily rollups refreshed for {users} users")
+    db.close()
+
+# Create the partitions first, so the tasks of the new periods have one
+schedule.every().day.at("00:00").do(create_task_partitions)
+if config.ROLLOVER_BY_TIMEZONE:
+    # UTC offsets are whole quarters of an hour, each run rolls over the timezones whose local midnight it is
+    for minute in (":00", ":15", ":30", ":45"):
+        schedule.every().hour.at(minute).do(create_new_task_for_timezones)
+else:
+    # Schedule the task to run at midnight every day (host machine timezone)
+    schedule.every().day.at("00:00").do(create_new_task_for_habits)
+if config.COMPACTION_HORIZON_DAYS > 0:
+    schedule.every().day.at("01:00").do(compact_old_tasks)
+if config.ROLLUP_INTERVAL_MINUTES > 0:
+    schedule.every(config.ROLLUP_INTERVAL_MINUTES).minutes.do(refresh_rollups)
 
 # Keep the script running and periodically check for scheduled tasks
 if __name__ == "__main__":
+    # The scheduler runs one job at a time, it does not need the default pool
+    configure_engine(config.SCHEDULER_POOL_SIZE)
+
     # Initialize the database
     init_db()
 
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from app.analytics import get_leaderboard, get_habits_struggled_most_last_period, get_habits_struggled_most_all_periods
+from app.services.util import PERIODICITIES
+
+def add_tasks(habit, completions, last_end_date):
+    """Add one task per entry in `completions`, oldest first, ending with `last_end_date`."""
+    for i, completed in enumerate(completions):
+        end_date = last_end_date - timedelta(days=len(completions) - 1 - i)
+        task = habit.add_task(f"{habit.name} task {i + 1}", end_date - timedelta(hours=23), end_date)
+        task.completed = completed
+
+
+def test_get_leaderboard_matches_python_streaks(db_session, habit_service, sample_user):
+    """Test that the SQL leaderboard returns the same streaks as Habit.get_current_streaks."""
+    yesterday = datetime.now() - timedelta(days=1)
+    tomorrow = datetime.now() + timedelta(days=1)
+
+    reading = habit_service.create_habit(sample_user, "Reading", "daily", should_add_task=False)
+    add_tasks(reading, [True, False, True, True, True], yesterday)
+    running = habit_service.create_habit(sample_user, "Running", "daily", should_add_task=False)
+    # The open task of the current period does not break the streak
+    add_tasks(running, [True, True, False], tomorrow)
+    cooking = habit_service.create_habit(sample_user, "Cooking", "daily", should_add_task=False)
+    add_tasks(cooking, [True, True, False], yesterday)
+    habit_service.create_habit(sample_user, "Swimming", "daily", should_add_task=False)
+    db_session.commit()
+
+    expected = sorted(
+        [(sample_user.name, habit.name, habit.get_current_streaks()) for habit in sample_user.habits],
+        key=lambda row: row[2], reverse=True,
+    )
+
+    leaderboard = get_leaderboard(db_session)
+
+    assert [row[2] for row in leaderboard] == [row[2] for row in expected]
+    assert set(leaderboard) == set(expected)
+    assert leaderboard[0] == (sample_user.name, "Reading", 3)
+
+
+def test_get_leaderboard_limit(db_session, habit_service, sample_user):
+    """Test that the leaderboard only returns the top `limit` entries."""
+    for i in range(3):
+        habit = habit_service.create_habit(sample_user, f"Habit {i}", "daily", should_add_task=False)
+        add_tasks(habit, [True] * (i + 1), datetime.now() - timedelta(days=1))
+    db_session.commit()
+
+    leaderboard = get_leaderboard(db_session, limit=2)
+
+    assert [row[1:] for row in leaderboard] == [("Habit 2", 3), ("Habit 1", 2)]
+
+
+def test_struggled_habits_all_periods_matches_each_period(db_session, habit_service, sample_user):
+    """Test that the single all-periods query returns the same missed tasks as querying every period on its own."""
+    last_week = datetime.now() - timedelta(days=7)
+    reading = habit_service.create_habit(sample_user, "Reading", "daily", should_add_task=False)
+    add_tasks(reading, [False, True, False, False, True, False], datetime.now() - timedelta(days=1))
+    running = habit_service.create_habit(sample_user, "Running", "daily", should_add_task=False)
+    add_tasks(running, [False, False, True], last_week)
+    db_session.commit()
+
+    expected = [
+        (period, *row) for period in PERIODICITIES
+        for row in get_habits_struggled_most_last_period(db_session, sample_user.id, period)
+    ]
+
+    rows = get_habits_struggled_most_all_periods(db_session, sample_user.id)
+
+    assert [row.period for row in rows] == [row[0] for row in expected]
+    assert set(map(tuple, rows)) == set(expected)
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app import analytics, async_analytics
+from app.services.async_habit_service import AsyncHabitService
+from app.services.async_task_service import AsyncTaskService
+from app.services.async_user_service import AsyncUserService
+
+@pytest.fixture
+def async_session_factory(db_session):
+    """AsyncSession factory on the test database. NullPool as every test runs its own event loop."""
+    url = db_session.get_bind().url.set(drivername="postgresql+psycopg")
+    engine = create_async_engine(url, poolclass=NullPool)
+    yield async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+def run(async_session_factory, test):
+    async def with_session():
+        async with async_session_factory() as session:
+            return await test(session)
+    return asyncio.run(with_session())
+
+
+def test_async_create_and_get_habit(async_session_factory, sample_user):
+    async def test(session):
+        habit_service = AsyncHabitService(session)
+        habit = await habit_service.create_habit(sample_user, "Exercise", "daily")
+        fetched = await habit_service.get_habit(sample_user.id, habit.id)
+        tasks = await habit_service.get_habit_tasks(fetched)
+        return fetched, tasks
+
+    habit, tasks = run(async_session_factory, test)
+
+    assert habit.name == "Exercise"
+    assert [task.description for task in tasks] == ["Exercise task 1"]
+
+
+def test_async_complete_task(async_session_factory, sample_user, sample_habit, sample_task):
+    async def test(session):
+        task = await AsyncTaskService(session).complete_task(sample_user.id, sample_task.id)
+        return task, task.habit
+
+    task, habit = run(async_session_factory, test)
+
+    assert task.completed is True
+    assert habit.current_streak == 1
+
+
+def test_async_complete_task_invalid_user(async_session_factory, sample_user, sample_task):
+    async def test(session):
+        await AsyncTaskService(session).complete_task(sample_user.id + 1, sample_task.id)
+
+    with pytest.raises(ValueError, match="Task does not belong to the user."):
+        run(async_session_factory, test)
+
+
+def test_async_get_user_from_token(async_session_factory, user_service, sample_user):
+    token = user_service.get_auth_token(sample_user.email)
+
+    async def test(session):
+        return await AsyncUserService(session).get_user_from_token(token)
+
+    user = run(async_session_factory, test)
+
+    assert user.id == sample_user.id
+
+
+def test_async_analytics_match_sync(async_session_factory, db_session, habit_service, sample_user):
+    habits = [habit_service.create_habit(sample_user, name, "daily") for name in ["Exercise", "Reading"]]
+    habits[0].get_latest_task().complete()
+    db_session.commit()
+
+    async def test(session):
+        leaderboard = await async_analytics.get_leaderboard(session)
+        streaks = await async_analytics.get_current_streaks([habit.id for habit in habits], async_session_factory)
+        return leaderboard, streaks
+
+    leaderboard, streaks = run(async_session_factory, test)
+
+    assert leaderboard == analytics.get_leaderboard(db_session)
+    assert streaks == {habits[0].id: 1, habits[1].id: 0}
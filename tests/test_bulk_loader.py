@@ -0,0 +1,31 @@
+from app.analytics import get_leaderboard
+from app.bulk_loader import seed_bulk, RowStream
+from app.models import User, Habit, Task
+
+def test_row_stream():
+    """Test that rows are serialized to CSV in chunks of the requested size."""
+    stream = RowStream([(1, "a,b", None, True), (2, "c", "d", False)])
+
+    data = stream.read(4) + stream.read()
+
+    assert data == '1,"a,b",,True\n2,c,d,False\n'
+    assert stream.read() == ""
+
+
+def test_seed_bulk(db_session):
+    """Test that bulk seeded data is consistent with the streak and analytics logic."""
+    counts = seed_bulk(db_session, users=3, habits_per_user=7, days=60)
+
+    assert counts["users"] == db_session.query(User).count() == 3
+    assert counts["habits"] == db_session.query(Habit).count() == 21
+    assert counts["tasks"] == db_session.query(Task).count()
+
+    for habit in db_session.query(Habit).all():
+        stored = (habit.current_streak, habit.longest_streak, habit.last_completed_period_end)
+        habit.recompute_streaks()
+        assert stored == (habit.current_streak, habit.longest_streak, habit.last_completed_period_end)
+    db_session.rollback()
+
+    assert get_leaderboard(db_session, vectorized=True) == get_leaderboard(db_session)
+    user = db_session.query(User).first()
+    assert user.check_password("Password1@234")
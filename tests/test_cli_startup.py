@@ -0,0 +1,6 @@
+from benchmarks.startup import heavy_modules_loaded
+
+# Test that the CLI loads its heavy dependencies lazily
+def test_cli_import_is_lazy():
+    """Test that importing the CLI doesn't import SQLAlchemy, bcrypt, the analytics or create the engine."""
+    assert heavy_modules_loaded() == []
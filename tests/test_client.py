@@ -1,10 +1,17 @@
 import pytest
-from datetime import timedelta
+from datetime import datetime, timedelta
 from click.testing import CliRunner
 from client import cli
 from app.services.user_service import UserService
 from app.services.habit_service import HabitService
 from app.services.task_service import TaskService
+from app.models import Task, TaskSummary
+
+@pytest.fixture(autouse=True)
+def no_daemon(monkeypatch, tmp_path):
+    """Run the commands in-process even when a daemon is listening on the default socket."""
+    monkeypatch.setattr("daemon.SOCKET_PATH", str(tmp_path / "no-daemon.sock"))
+
 
 @pytest.fixture
 def runner():
@@ -83,7 +90,7 @@ def test_list_habits(runner, db_session):
 
     # Simulate listing habits
     result = runner.invoke(cli, ['list-habits', '--token', token])
-    tasks = habit.tasks
+    tasks = habit.get_tasks()
 
     # Check if the habit is listed correctly
     assert result.exit_code == 0
@@ -158,7 +165,7 @@ def test_list_tasks(runner, db_session):
     habit = habit_service.create_habit(user=user, name="Read", periodicity="daily", should_add_task=True)
 
     task_service = TaskService(db_session)
-    task = habit.tasks[0]
+    task = habit.get_tasks()[0]
     task_service.complete_task(user.id, task.id)
 
     token = user_service.get_auth_token(user.email)
@@ -167,6 +174,34 @@ def test_list_tasks(runner, db_session):
     assert f"{task.id}. Read task 1 - Completed" in result.output 
 
 
+# Test that compacted months don't take the place of tasks in a page
+def test_list_tasks_pages_with_summaries(runner, db_session):
+    user_service = UserService(db_session)
+    user = user_service.register(name="Bob", email="bob@example.com", password="P@assword123", should_commit=True)
+    habit = HabitService(db_session).create_habit(user=user, name="Read", periodicity="daily", should_add_task=False)
+    for month in range(1, 4):
+        db_session.add(TaskSummary(habit_id=habit.id, period_start=datetime(2024, month, 1),
+                                   period_end=datetime(2024, month, 28), completed_count=28, missed_count=0))
+    tasks = [Task(description=f"Read task {day}", habit=habit, completed=False, start_date=datetime(2024, 4, day),
+                  end_date=datetime(2024, 4, day, 23, 59)) for day in range(1, 4)]
+    db_session.add_all(tasks)
+    db_session.commit()
+    token = user_service.get_auth_token(user.email)
+    list_tasks = lambda *args: runner.invoke(cli, ['list-tasks', '--token', token, '--habit_id', habit.id, *args]).output
+
+    first_page = list_tasks('--limit', '2')
+    assert [month in first_page for month in ("2024-01.", "2024-02.", "2024-03.")] == [True] * 3
+    assert f"{tasks[1].id}. Read task 2" in first_page and "Read task 3" not in first_page
+    second_page = list_tasks('--limit', '2', '--after-id', str(tasks[1].id))
+    assert f"{tasks[2].id}. Read task 3" in second_page and "Compacted month" not in second_page
+
+    # In descending order the months follow the last page of tasks
+    first_page = list_tasks('--limit', '3', '--order', 'desc')
+    assert "Compacted month" not in first_page
+    last_page = list_tasks('--limit', '3', '--order', 'desc', '--after-id', str(tasks[0].id))
+    assert last_page.count("Compacted month") == 3
+
+
 # Test for completing a task
 def test_complete_task(runner, db_session):
     user_service = UserService(db_session)
@@ -174,7 +209,7 @@ def test_complete_task(runner, db_session):
 
     habit_service = HabitService(db_session)
     habit = habit_service.create_habit(user=user, name="Jogging", periodicity="daily", should_add_task=True)
-    task = habit.tasks[0]
+    task = habit.get_tasks()[0]
 
     # Run complete_task command
     token = user_service.get_auth_token(user.email)
@@ -183,6 +218,24 @@ def test_complete_task(runner, db_session):
     assert "Task Jogging task 1 marked as completed." in result.output
 
 
+def test_complete_tasks(runner, db_session, tmp_path):
+    user_service = UserService(db_session)
+    user = user_service.register(name="Charlie", email="charlie2@example.com", password="P@assword123", should_commit=True)
+
+    habit_service = HabitService(db_session)
+    jogging = habit_service.create_habit(user=user, name="Jogging", periodicity="daily", should_add_task=True)
+    reading = habit_service.create_habit(user=user, name="Reading", periodicity="weekly", should_add_task=True)
+    ids_file = tmp_path / "task_ids.txt"
+    ids_file.write_text(f"{reading.get_tasks()[0].id}\n")
+
+    # Task IDs from the arguments and from a file
+    token = user_service.get_auth_token(user.email)
+    result = runner.invoke(cli, ['complete-tasks', '--token', token, '--file', str(ids_file), str(jogging.get_tasks()[0].id), '9999'])
+    assert result.exit_code == 0
+    assert "2 tasks completed, 1 failed." in result.output
+    assert "Task 9999: Task not found." in result.output
+
+
 # Test for showing current streaks
 def test_show_current_streaks(runner, db_session):
     user_service = UserService(db_session)
@@ -192,7 +245,7 @@ def test_show_current_streaks(runner, db_session):
     habit = habit_service.create_habit(user=user, name="Exercise", periodicity="daily", should_add_task=True)
 
     task_service = TaskService(db_session)
-    task = habit.tasks[0]
+    task = habit.get_tasks()[0]
     task_service.complete_task(user.id, task.id)
 
     token = user_service.get_auth_token(user.email)
@@ -210,7 +263,7 @@ def test_longest_streak(runner, db_session):
     habit = habit_service.create_habit(user=user, name="Jogging", periodicity="daily", should_add_task=True)
 
     task_service = TaskService(db_session)
-    task1 = habit.tasks[0]
+    task1 = habit.get_tasks()[0]
     task2 = habit.add_task(description="Jogging task 2", start_date=habit.created_at + timedelta(days=1), end_date=habit.created_at + timedelta(days=2))
     task_service.complete_task(user.id, task1.id)
     task_service.complete_task(user.id, task2.id)
@@ -230,7 +283,7 @@ def test_longest_streak_for_habit(runner, db_session):
     habit = habit_service.create_habit(user=user, name="Yoga", periodicity="daily", should_add_task=True)
 
     task_service = TaskService(db_session)
-    task1 = habit.tasks[0]
+    task1 = habit.get_tasks()[0]
     task2 = habit.add_task(description="Yoga task 2", start_date=habit.created_at + timedelta(days=1), end_date=habit.created_at + timedelta(days=2))
     task_service.complete_task(user.id, task1.id)
     task_service.complete_task(user.id, task2.id)
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from app.analytics import current_streaks_query
+from app.compaction import compact_tasks
+from app.models import Task, TaskSummary
+from app.streak_engine import load_streaks
+
+NOW = datetime(2024, 6, 15, 12, 0)
+
+
+def add_daily_tasks(db_session, habit, start: datetime, completed: list):
+    """Add one task per day from `start` with the given completion flags."""
+    for day, is_completed in enumerate(completed):
+        start_date = start + timedelta(days=day)
+        db_session.add(Task(description=f"Day {day}", habit=habit, start_date=start_date,
+                            end_date=start_date + timedelta(hours=23), completed=is_completed))
+    db_session.commit()
+
+
+def streaks(db_session, habit):
+    """Current and longest streaks through every streak computation, with the tasks count."""
+    current = db_session.execute(current_streaks_query([habit.id])).one()[1]
+    _, engine_current, engine_longest = load_streaks(db_session, [habit.id])
+    return {
+        "current": habit.get_current_streaks(),
+        "longest": habit.get_longest_streaks(),
+        "sql_current": current,
+        "engine": (int(engine_current[0]), int(engine_longest[0])),
+        "tasks": habit.count_tasks(),
+    }
+
+
+def test_compact_tasks_keeps_streaks(db_session, sample_habit):
+    """Test that compacted months give the same streaks and counts as the raw tasks."""
+    # January ends with a run of 27 that continues into February, a run of 7 ends on March 3rd and continues
+    # into the raw tasks of March
+    completed = [True] * 3 + [False] + [True] * 27 + [True] * 12 + [False] * 2 + [True] * 10 + [False] + [True] * 7
+    add_daily_tasks(db_session, sample_habit, datetime(2024, 1, 1), completed)
+    add_daily_tasks(db_session, sample_habit, datetime(2024, 3, 5), [True] * 3)
+    before = streaks(db_session, sample_habit)
+
+    tasks, summaries = compact_tasks(db_session, horizon_days=100, now=NOW)
+
+    assert (tasks, summaries) == (60, 2)
+    assert streaks(db_session, sample_habit) == before
+    assert before["current"] == 10 and before["longest"] == 39
+    january = db_session.get(TaskSummary, (sample_habit.id, datetime(2024, 1, 1)))
+    assert (january.completed_count, january.missed_count) == (30, 1)
+    assert (january.leading_streak, january.trailing_streak, january.longest_streak) == (3, 27, 27)
+
+
+def test_compact_tasks_twice_appends_to_summary(db_session, sample_habit):
+    """Test that tasks of an already compacted month are merged into its summary."""
+    add_daily_tasks(db_session, sample_habit, datetime(2024, 1, 1), [True, False, True, True])
+    compact_tasks(db_session, horizon_days=100, now=NOW)
+    add_daily_tasks(db_session, sample_habit, datetime(2024, 1, 10), [True, True, False])
+
+    compact_tasks(db_session, horizon_days=100, now=NOW)
+
+    summary = db_session.get(TaskSummary, (sample_habit.id, datetime(2024, 1, 1)))
+    assert (summary.completed_count, summary.missed_count) == (5, 2)
+    assert (summary.leading_streak, summary.trailing_streak, summary.longest_streak) == (1, 0, 4)
+
+
+def test_list_task_summaries(db_session, sample_habit):
+    """Test that compacted months are listed in order."""
+    add_daily_tasks(db_session, sample_habit, datetime(2024, 1, 30), [True] * 4)
+    compact_tasks(db_session, horizon_days=100, now=NOW)
+
+    from app.services.task_service import TaskService
+    summaries = TaskService(db_session).list_task_summaries(sample_habit.id, descending=True)
+
+    assert [summary.period_start for summary in summaries] == [datetime(2024, 2, 1), datetime(2024, 1, 1)]
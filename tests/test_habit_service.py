@@ -1,3 +1,5 @@
+from datetime import datetime, timedelta
+
 # Test HabitService create_habit method
 def test_create_habit(habit_service, sample_user):
     habit = habit_service.create_habit(user=sample_user, name="Exercise", periodicity="daily")
@@ -13,8 +15,8 @@ def test_create_habit(habit_service, sample_user):
 def test_add_task(habit_service, sample_user):
     habit = habit_service.create_habit(user=sample_user, name="Exercise", periodicity="daily")
     # Check that a task has been added
-    assert len(habit.tasks) == 1
-    task = habit.tasks[0]
+    assert habit.count_tasks() == 1
+    task = habit.get_tasks()[0]
     assert task.description == "Exercise task 1"
     assert task.completed is False  # The task should not be marked as completed by default
 
@@ -36,7 +38,7 @@ def test_get_current_streaks(habit_service, sample_user):
     habit = habit_service.create_habit(user=sample_user, name="Exercise", periodicity="daily")
 
     # Mark the task as completed
-    task = habit.tasks[0]
+    task = habit.get_tasks()[0]
     task.complete()
 
     # Get the current streak
@@ -85,3 +87,64 @@ def test_get_all_habits(habit_service, sample_user):
     all_habits = habit_service.get_all_habits()
     
     assert len(all_habits) > 0  # Should return at least the habits we created in the test
+
+
+# Test HabitService add_task rolls the streak over
+def test_add_task_resets_streak_after_missed_period(habit_service, sample_user):
+    habit = habit_service.create_habit(user=sample_user, name="Exercise", periodicity="daily")
+    habit.current_streak = 3
+
+    # The task of the previous period was never completed
+    habit_service.add_task(habit)
+
+    assert habit.current_streak == 0
+
+
+# Test HabitService recompute_streaks method
+def test_recompute_streaks(habit_service, sample_user):
+    habit = habit_service.create_habit(user=sample_user, name="Exercise", periodicity="daily")
+    habit.get_tasks()[0].completed = True
+    habit.current_streak = 0
+
+    count = habit_service.recompute_streaks([habit])
+
+    assert count == 1
+    assert habit.current_streak == 1
+    assert habit.longest_streak == 1
+
+
+# Test HabitService add_tasks_for_due_habits method
+def test_add_tasks_for_due_habits(habit_service, db_session, sample_user):
+    daily = habit_service.create_habit(user=sample_user, name="Exercise", periodicity="daily")
+    weekly = habit_service.create_habit(user=sample_user, name="Reading", periodicity="weekly")
+    monthly = habit_service.create_habit(user=sample_user, name="Cleaning", periodicity="monthly")
+    daily.get_tasks()[0].complete()
+    weekly.current_streak = 2
+    # The periods of the daily and weekly habits ended yesterday
+    for habit in [daily, weekly]:
+        habit.get_tasks()[0].end_date = datetime.now() - timedelta(days=1)
+    db_session.commit()
+
+    # A chunk size of 1 makes every habit go through its own INSERT ... SELECT
+    created = habit_service.add_tasks_for_due_habits(chunk_size=1)
+    db_session.expire_all()
+
+    assert created == 2
+    assert [task.description for task in daily.get_tasks()] == ["Exercise task 1", "Exercise task 2"]
+    assert daily.get_tasks()[1].end_date.date() == datetime.now().date()
+    assert daily.current_streak == 1  # Completed before the rollover
+    assert weekly.current_streak == 0  # Missed the previous period
+    assert monthly.count_tasks() == 1  # Current period still open
+
+
+# Test HabitService get_due_habits method
+def test_get_due_habits(habit_service, db_session, sample_user):
+    daily = habit_service.create_habit(user=sample_user, name="Exercise", periodicity="daily")
+    habit_service.create_habit(user=sample_user, name="Reading", periodicity="weekly")
+    new_habit = habit_service.create_habit(user=sample_user, name="Cooking", periodicity="daily", should_add_task=False)
+    daily.get_tasks()[0].end_date = datetime.now() - timedelta(days=1)
+    db_session.commit()
+
+    due_habits = habit_service.get_due_habits()
+
+    assert {habit.id for habit in due_habits} == {daily.id, new_habit.id}
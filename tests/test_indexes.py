@@ -0,0 +1,115 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event, text
+from app.analytics import get_habits_struggled_most_last_period
+from app.models import User
+from app.partitions import create_task_partitions
+
+# Size of the seeded dataset, large enough for the planner to prefer indexes over sequential scans
+USERS = 200
+HABITS_PER_USER = 5
+TASKS_PER_HABIT = 200
+
+@pytest.fixture
+def seeded_db(db_session):
+    """Seed USERS * HABITS_PER_USER * TASKS_PER_HABIT tasks with set-based inserts and refresh statistics."""
+    db_session.execute(text("""
+        INSERT INTO users (name, email, password_hash, created_at, updated_at)
+        SELECT 'User ' || g, 'user' || g || '@example.com', 'hash', now(), now()
+        FROM generate_series(1, :users) g
+    """), {"users": USERS})
+    db_session.execute(text("""
+        INSERT INTO habits (name, periodicity, user_id, created_at, updated_at)
+        SELECT 'Habit ' || g, (ARRAY['daily', 'weekly', 'monthly'])[1 + g % 3], u.id, now(), now()
+        FROM users u, generate_series(1, :habits) g
+    """), {"habits": HABITS_PER_USER})
+    create_task_partitions(db_session, datetime.now() - timedelta(days=TASKS_PER_HABIT), datetime.now())
+    db_session.execute(text("""
+        INSERT INTO tasks (description, start_date, end_date, updated_at, completed, habit_id)
+        SELECT 'Task ' || d,
+               date_trunc('day', now()) - d * interval '1 day',
+               date_trunc('day', now()) - (d - 1) * interval '1 day' - interval '1 second',
+               now(), d % 3 <> 0, h.id
+        FROM habits h, generate_series(0, :tasks - 1) d
+    """), {"tasks": TASKS_PER_HABIT})
+    db_session.execute(text("ANALYZE users, habits, tasks"))
+    db_session.commit()
+    return db_session
+
+
+def capture_plans(db_session, run):
+    """Run `run()` and return the JSON plan of every SELECT it issued."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    connection = db_session.connection()
+    return [connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()[0]["Plan"]
+            for statement, parameters in statements]
+
+
+def plan_values(plan, key):
+    """Collect the values of `key` anywhere in a plan tree."""
+    values = {plan[key]} if key in plan else set()
+    for child in plan.get("Plans", []):
+        values |= plan_values(child, key)
+    return values
+
+
+def used_indexes(db_session, plan):
+    """Collect the index names used anywhere in a plan tree, naming partition indexes after the index they belong to."""
+    indexes = plan_values(plan, "Index Name")
+    parents = db_session.execute(text("""
+        SELECT child.relname, parent.relname FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        WHERE child.relname = ANY(:names)
+    """), {"names": list(indexes)}).all()
+    return indexes | {parent for _, parent in parents}
+
+
+def test_habit_tasks_load_uses_index(seeded_db, habit_service):
+    user = seeded_db.query(User).first()
+    habit = habit_service.get_user_habits_for_period(user.id)[0]
+
+    plans = capture_plans(seeded_db, lambda: habit.get_tasks())
+
+    assert "ix_tasks_habit_id_start_date" in used_indexes(seeded_db, plans[-1])
+
+
+def test_user_habits_for_period_uses_index(seeded_db, habit_service):
+    user = seeded_db.query(User).first()
+
+    plans = capture_plans(seeded_db, lambda: habit_service.get_user_habits_for_period(user.id, "daily"))
+
+    assert "ix_habits_user_id_periodicity" in used_indexes(seeded_db, plans[-1])
+
+
+def test_struggled_habits_uses_indexes(seeded_db):
+    user = seeded_db.query(User).first()
+
+    plans = capture_plans(seeded_db, lambda: get_habits_struggled_most_last_period(seeded_db, user.id, "daily"))
+
+    indexes = used_indexes(seeded_db, plans[-1])
+    assert "ix_habits_user_id_periodicity" in indexes
+    assert indexes & {"ix_tasks_habit_id_start_date", "ix_tasks_habit_id_completed_end_date"}
+
+
+def test_struggled_habits_prunes_partitions(seeded_db):
+    user = seeded_db.query(User).first()
+
+    plans = capture_plans(seeded_db, lambda: get_habits_struggled_most_last_period(seeded_db, user.id, "daily"))
+
+    # The last daily period spans one or two months
+    partitions = {name for name in plan_values(plans[-1], "Relation Name") if name.startswith("tasks_")}
+    assert 1 <= len(partitions) <= 2
+    assert "tasks_default" not in partitions
@@ -0,0 +1,74 @@
+import threading
+from datetime import datetime, timedelta
+from app.config import config
+from app.database import SessionLocal
+from app.leaderboard import get_cached_leaderboard, get_floor, rebuild_leaderboard, update_leaderboard
+from app.models import LeaderboardEntry, LeaderboardState
+from app.services.task_service import TaskService
+
+
+def test_cached_leaderboard_is_built_when_missing(db_session, habit_service, sample_user):
+    """Test that the first read builds the cache and that it ranks the stored current streaks."""
+    for i, streak in enumerate([2, 5, 0, 5]):
+        habit = habit_service.create_habit(sample_user, f"Habit {i}", "daily", should_add_task=False)
+        habit.current_streak = streak
+    db_session.commit()
+    assert db_session.get(LeaderboardState, 1) is None
+
+    leaderboard = get_cached_leaderboard(db_session, limit=3)
+
+    assert leaderboard == [(sample_user.name, "Habit 1", 5), (sample_user.name, "Habit 3", 5), (sample_user.name, "Habit 0", 2)]
+    assert db_session.get(LeaderboardState, 1) is not None
+
+
+def test_cached_leaderboard_is_updated_in_place(db_session, habit_service, sample_user, monkeypatch):
+    """Test that completing a task moves a habit into a full cache, pushing the last entry out, without a rebuild."""
+    monkeypatch.setattr(config, "LEADERBOARD_CACHE_SIZE", 2)
+    habits = []
+    for i, streak in enumerate([3, 2, 1]):
+        habit = habit_service.create_habit(sample_user, f"Habit {i}", "daily", should_add_task=False)
+        habit.current_streak = streak
+        habits.append(habit)
+    db_session.commit()
+    rebuild_leaderboard(db_session)
+    assert get_floor(db_session) == (1, habits[2].id)
+    built_at = db_session.get(LeaderboardState, 1).built_at
+
+    # Two completions bring the last habit to 3, ahead of the second one
+    for _ in range(2):
+        task = habits[2].add_task("Today", datetime.now(), datetime.now() + timedelta(hours=1))
+        db_session.commit()
+        TaskService(db_session).complete_task(sample_user.id, task.id)
+
+    assert habits[2].current_streak == 3
+    assert get_floor(db_session) == (2, habits[1].id)
+    assert get_cached_leaderboard(db_session, limit=2) == [(sample_user.name, "Habit 0", 3), (sample_user.name, "Habit 2", 3)]
+    db_session.expire_all()
+    assert db_session.get(LeaderboardState, 1).built_at == built_at
+    assert db_session.query(LeaderboardEntry).count() == 2
+
+
+def test_concurrent_entries_take_turns(db_session, habit_service, sample_user, monkeypatch):
+    """Test that a second transaction bringing the same habit into the cache waits for the first one and updates its entry."""
+    monkeypatch.setattr(config, "LEADERBOARD_CACHE_SIZE", 1)
+    habits = []
+    for i, streak in enumerate([2, 1]):
+        habit = habit_service.create_habit(sample_user, f"Habit {i}", "daily", should_add_task=False)
+        habit.current_streak = streak
+        habits.append(habit)
+    db_session.commit()
+    rebuild_leaderboard(db_session)
+
+    first, second = SessionLocal(), SessionLocal()
+    update_leaderboard(first, habits[1].id, 3)  # Enters the cache, holding the state row until it commits
+    thread = threading.Thread(target=lambda: (update_leaderboard(second, habits[1].id, 4), second.commit()))
+    thread.start()
+    thread.join(timeout=0.5)
+    assert thread.is_alive()
+    first.commit()
+    thread.join()
+    first.close()
+    second.close()
+
+    assert get_floor(db_session) == (2, habits[0].id)
+    assert [(entry.habit_id, entry.streak) for entry in db_session.query(LeaderboardEntry)] == [(habits[1].id, 4)]
@@ -83,3 +83,45 @@ def test_complete_task_overdue(db_session, sample_task):
     with pytest.raises(ValueError, match="Task is overdue and cannot be completed."):
         sample_task.complete()
 
+
+def test_record_completion_updates_streak_counters(db_session, sample_habit):
+    """Test that completing tasks in order extends the stored streaks."""
+    end_date = datetime.now() + timedelta(days=1)
+    task1 = sample_habit.add_task("Task 1", datetime.now(), end_date)
+    task2 = sample_habit.add_task("Task 2", datetime.now(), end_date + timedelta(days=1))
+    db_session.commit()
+
+    task1.complete()
+    task2.complete()
+
+    assert sample_habit.current_streak == 2
+    assert sample_habit.longest_streak == 2
+    assert sample_habit.last_completed_period_end == task2.end_date
+
+
+def test_record_rollover_resets_current_streak(db_session, sample_habit):
+    """Test that a period ending without completion resets the current streak only."""
+    task1 = sample_habit.add_task("Task 1", datetime.now(), datetime.now() + timedelta(days=1))
+    task2 = sample_habit.add_task("Task 2", datetime.now(), datetime.now() + timedelta(days=2))
+    db_session.commit()
+    task1.complete()
+
+    sample_habit.record_rollover(task2)
+
+    assert sample_habit.current_streak == 0
+    assert sample_habit.longest_streak == 1
+
+
+def test_recompute_streaks(db_session, sample_habit):
+    """Test that the stored streaks can be rebuilt from the task history."""
+    end_date = datetime.now() - timedelta(days=1)
+    for completed in [True, True, False, True]:
+        task = sample_habit.add_task("Task", end_date - timedelta(days=1), end_date)
+        task.completed = completed
+    db_session.commit()
+
+    sample_habit.recompute_streaks()
+
+    assert sample_habit.current_streak == 1
+    assert sample_habit.longest_streak == 2
+    assert sample_habit.last_completed_period_end == end_date
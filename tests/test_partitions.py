@@ -0,0 +1,55 @@
+from datetime import datetime
+from sqlalchemy import text
+from app.models import Task
+from app.partitions import create_task_partitions, create_future_task_partitions, detach_task_partitions, get_task_partitions
+
+
+def test_create_task_partitions(db_session):
+    """Test that monthly partitions are created once and named after their month."""
+    created = create_task_partitions(db_session, datetime(2001, 1, 15), datetime(2001, 3, 1))
+    try:
+        assert created == ["tasks_p2001_01", "tasks_p2001_02", "tasks_p2001_03"]
+        assert create_task_partitions(db_session, datetime(2001, 1, 1), datetime(2001, 3, 1)) == []
+        assert get_task_partitions(db_session)["tasks_p2001_02"] == datetime(2001, 2, 1)
+    finally:
+        detach_task_partitions(db_session, datetime(2001, 4, 1), drop=True)
+
+
+def test_create_task_partitions_moves_default_rows(db_session, sample_habit):
+    """Test that tasks stored in the default partition move to the partition created for their month."""
+    task = Task(description="Old task", habit=sample_habit, start_date=datetime(2002, 5, 3), end_date=datetime(2002, 5, 4))
+    db_session.add(task)
+    db_session.commit()
+    assert db_session.scalar(text("SELECT count(*) FROM tasks_default WHERE id = :id"), {"id": task.id}) == 1
+
+    create_task_partitions(db_session, datetime(2002, 5, 1), datetime(2002, 5, 1))
+    try:
+        assert db_session.scalar(text("SELECT count(*) FROM tasks_p2002_05 WHERE id = :id"), {"id": task.id}) == 1
+        assert db_session.get(Task, task.id).description == "Old task"
+    finally:
+        detach_task_partitions(db_session, datetime(2002, 6, 1), drop=True)
+
+
+def test_detach_task_partitions(db_session):
+    """Test that only the partitions ending before the given date are detached."""
+    create_task_partitions(db_session, datetime(2003, 1, 1), datetime(2003, 2, 1))
+
+    detached = detach_task_partitions(db_session, datetime(2003, 2, 1))
+    try:
+        assert detached == ["tasks_p2003_01"]
+        assert "tasks_p2003_01" not in get_task_partitions(db_session)
+        assert "tasks_p2003_02" in get_task_partitions(db_session)
+    finally:
+        db_session.execute(text("DROP TABLE tasks_p2003_01"))
+        detach_task_partitions(db_session, datetime(2003, 3, 1), drop=True)
+
+
+def test_create_future_task_partitions(db_session):
+    """Test that the current month and the months ahead have a partition."""
+    created = create_future_task_partitions(db_session, 2, now=datetime(2030, 11, 20))
+    try:
+        assert {"tasks_p2030_11", "tasks_p2030_12", "tasks_p2031_01"} <= set(get_task_partitions(db_session))
+    finally:
+        for name in created:
+            db_session.execute(text(f"DROP TABLE {name}"))
+        db_session.commit()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from datetime import datetime
+from app.periods import period_bounds, period_index, current_period, previous_period, period_indexes, period_bounds_array
+from app.services.util import PERIODICITIES
+
+
+def test_current_period_boundaries():
+    """Test that the calendar periods end exactly at the end of their month, quarter, half year or year."""
+    now = datetime(2024, 2, 10, 15, 30)
+    end = lambda *args: datetime(*args, 23, 59, 59, 999999)
+
+    assert current_period('daily', now) == (datetime(2024, 2, 10), end(2024, 2, 10))
+    assert current_period('weekly', now) == (datetime(2024, 2, 10), end(2024, 2, 16))
+    assert current_period('fortnightly', now) == (datetime(2024, 2, 10), end(2024, 2, 23))
+    assert current_period('monthly', now) == (datetime(2024, 2, 1), end(2024, 2, 29))
+    assert current_period('quarterly', now) == (datetime(2024, 1, 1), end(2024, 3, 31))
+    assert current_period('biannually', datetime(2024, 8, 1)) == (datetime(2024, 7, 1), end(2024, 12, 31))
+    assert current_period('yearly', now) == (datetime(2024, 1, 1), end(2024, 12, 31))
+    assert previous_period('monthly', datetime(2024, 1, 31)) == (datetime(2023, 12, 1), end(2023, 12, 31))
+
+
+def test_period_bounds_are_cached():
+    """Test that the boundaries of a period are computed once."""
+    period_bounds.cache_clear()
+    for _ in range(3):
+        current_period('quarterly', datetime(2024, 5, 5))
+
+    assert period_bounds.cache_info().misses == 1
+    assert period_bounds.cache_info().hits == 2
+
+
+@pytest.mark.parametrize("periodicity", PERIODICITIES)
+def test_period_bounds_array_matches_period_bounds(periodicity):
+    """Test that the vectorized boundaries of many periods are those of each period."""
+    indexes = period_indexes(periodicity, datetime(2019, 11, 20), datetime(2024, 3, 1))
+    starts, ends = period_bounds_array(periodicity, indexes)
+
+    assert len(indexes) > 0
+    assert [(start, end) for start, end in zip(starts.tolist(), ends.tolist())] == [
+        period_bounds(periodicity, int(index)) for index in indexes
+    ]
+    assert np.all(starts[1:] == ends[:-1] + np.timedelta64(1, 'us'))
+
+
+def test_invalid_periodicity():
+    with pytest.raises(ValueError, match="Invalid periodicity value"):
+        period_index('hourly', datetime.now())
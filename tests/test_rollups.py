@@ -0,0 +1,66 @@
+from datetime import datetime, date, timedelta
+from app.analytics import get_user_activity
+from app.models import Habit, Task, User, UserDailyStats, RollupWatermark
+from app.rollups import refresh_user_daily_stats
+from app.services.task_service import TaskService
+
+
+def add_daily_task(db_session, habit, days_ago: int, completed: bool = False):
+    """
+    Add a task for the day `days_ago` days before today, completed halfway through it if `completed`.
+    It was last changed well before the watermark overlap of the refreshes.
+    """
+    start_date = datetime.combine(date.today() - timedelta(days=days_ago), datetime.min.time())
+    task = Task(description=f"{habit.name} {days_ago} days ago", habit=habit, start_date=start_date,
+                updated_at=datetime.now() - timedelta(days=2),
+                end_date=start_date + timedelta(hours=23, minutes=59), completed=completed,
+                completed_at=start_date + timedelta(hours=12) if completed else None)
+    db_session.add(task)
+    return task
+
+
+def test_refresh_user_daily_stats_is_incremental(db_session, sample_user, sample_habit):
+    """Test that the rollup counts each day's tasks and that a refresh only recomputes the users whose tasks changed."""
+    db_session.query(RollupWatermark).delete()
+    other_user = User(name="Other User", email="other@example.com", password_hash="hash")
+    other_habit = Habit(name="Reading", periodicity="daily", user=other_user)
+    add_daily_task(db_session, other_habit, 1, completed=True)
+    add_daily_task(db_session, sample_habit, 2)
+    add_daily_task(db_session, sample_habit, 1, completed=True)
+    today = add_daily_task(db_session, sample_habit, 0)
+    db_session.commit()
+
+    assert refresh_user_daily_stats(db_session) == 2
+    activity = get_user_activity(db_session, sample_user.id, days=3)
+    assert [tuple(row) for row in activity] == [
+        (date.today() - timedelta(days=2), 0, 1, 1),
+        (date.today() - timedelta(days=1), 1, 0, 1),
+        (date.today(), 0, 0, 1),
+    ]
+
+    TaskService(db_session).complete_task(sample_user.id, today.id)
+
+    assert refresh_user_daily_stats(db_session) == 1
+    assert tuple(get_user_activity(db_session, sample_user.id, days=1)[0]) == (date.today(), 1, 0, 1)
+    assert len(get_user_activity(db_session, other_user.id, days=3)) == 1
+
+
+def test_refresh_user_daily_stats_keeps_open_tasks_active(db_session, sample_user):
+    """Test that a habit whose weekly task stays open is active on the days without any task change."""
+    db_session.query(RollupWatermark).delete()
+    weekly = Habit(name="Cleaning", periodicity="weekly", user=sample_user)
+    start_date = datetime.combine(date.today() - timedelta(days=3), datetime.min.time())
+    db_session.add(Task(description="Cleaning task 1", habit=weekly, start_date=start_date, completed=False,
+                        end_date=start_date + timedelta(days=7) - timedelta(microseconds=1),
+                        updated_at=datetime.now() - timedelta(days=4)))
+    db_session.commit()
+    refresh_user_daily_stats(db_session)
+
+    # The previous refresh ran two days ago, the rows of the days since were never written
+    db_session.query(RollupWatermark).update({RollupWatermark.watermark: datetime.now() - timedelta(days=2)})
+    db_session.query(UserDailyStats).filter(UserDailyStats.day > date.today() - timedelta(days=2)).delete()
+    db_session.commit()
+
+    assert refresh_user_daily_stats(db_session) == 1
+    activity = get_user_activity(db_session, sample_user.id, days=3)
+    assert [(row[0], row[3]) for row in activity] == [(date.today() - timedelta(days=day), 1) for day in (2, 1, 0)]
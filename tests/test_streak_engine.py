@@ -0,0 +1,58 @@
+import numpy as np
+from datetime import datetime, timedelta
+from app.analytics import get_leaderboard, get_user_longest_streak
+from app.streak_engine import compute_streaks, load_streaks
+
+def test_compute_streaks():
+    """Test current and longest streaks computed from run-length encoded task columns."""
+    habit_ids = np.array([1, 1, 1, 1, 1, 2, 2, 2, 3, 3])
+    completed = np.array([True, True, False, True, False, True, False, True, True, False])
+    # The last task of habit 1 is still open, the last task of habit 3 was missed
+    is_open = np.array([False, False, False, False, True, False, False, False, False, False])
+
+    ids, current, longest = compute_streaks(habit_ids, completed, is_open)
+
+    assert ids.tolist() == [1, 2, 3]
+    assert current.tolist() == [1, 1, 0]
+    assert longest.tolist() == [2, 1, 1]
+
+
+def test_compute_streaks_empty():
+    ids, current, longest = compute_streaks(np.array([]), np.array([]), np.array([]))
+    assert len(ids) == len(current) == len(longest) == 0
+
+
+def test_load_streaks_matches_habit_methods(db_session, habit_service, sample_user):
+    """Test that the engine agrees with Habit.get_current_streaks and Habit.get_longest_streaks."""
+    yesterday = datetime.now() - timedelta(days=1)
+    patterns = {"Reading": [True, True, False, True], "Running": [False, True, True], "Cooking": [True, False]}
+    habits = []
+    for name, completions in patterns.items():
+        habit = habit_service.create_habit(sample_user, name, "daily", should_add_task=False)
+        for i, completed in enumerate(completions):
+            end_date = yesterday - timedelta(days=len(completions) - 1 - i)
+            task = habit.add_task(f"{name} task {i + 1}", end_date - timedelta(hours=23), end_date)
+            task.completed = completed
+        habits.append(habit)
+    db_session.commit()
+
+    ids, current, longest = load_streaks(db_session)
+
+    assert ids.tolist() == sorted(habit.id for habit in habits)
+    by_id = {habit.id: habit for habit in habits}
+    for habit_id, current_streak, longest_streak in zip(ids.tolist(), current.tolist(), longest.tolist()):
+        assert current_streak == by_id[habit_id].get_current_streaks()
+        assert longest_streak == by_id[habit_id].get_longest_streaks()
+
+
+def test_vectorized_analytics_match(db_session, habit_service, sample_user):
+    """Test that the vectorized leaderboard and longest streak match the default paths."""
+    exercise = habit_service.create_habit(sample_user, "Exercise", "daily")
+    habit_service.create_habit(sample_user, "Reading", "daily")
+    habit_service.create_habit(sample_user, "Cooking", "weekly", should_add_task=False)
+    exercise.get_tasks()[0].complete()
+    db_session.commit()
+
+    assert get_leaderboard(db_session, vectorized=True) == get_leaderboard(db_session)
+    assert get_user_longest_streak(sample_user, vectorized=True) == (exercise, 1)
+    assert get_user_longest_streak(sample_user) == (exercise, 1)
@@ -1,6 +1,7 @@
 import pytest
 from app.services.task_service import TaskService
-from app.models import User
+from datetime import datetime, timedelta
+from app.models import User, Task
 
 def test_complete_task_valid(db_session, sample_user, sample_task):
     """Test completing a task with valid user and task."""
@@ -44,3 +45,103 @@ def test_complete_task_task_not_found(db_session, sample_user):
     
     # Since the task doesn't exist, it should return None
     assert task is None
+
+
+def test_complete_task_updates_streaks(db_session, sample_user, sample_habit, sample_task):
+    """Test that completing a task updates the habit's stored streak counters."""
+    task_service = TaskService(db_session)
+
+    task_service.complete_task(sample_user.id, sample_task.id)
+
+    assert sample_habit.current_streak == 1
+    assert sample_habit.longest_streak == 1
+    assert sample_habit.last_completed_period_end == sample_task.end_date
+
+
+def test_complete_task_is_idempotent(db_session, sample_user, sample_habit, sample_task):
+    """Test that completing a task twice, as two devices would, counts it once."""
+    task_service = TaskService(db_session)
+
+    first = task_service.complete_task(sample_user.id, sample_task.id)
+    completed_at = first.completed_at
+    second = task_service.complete_task(sample_user.id, sample_task.id)
+
+    assert second.completed is True
+    assert second.completed_at == completed_at
+    assert sample_habit.current_streak == 1
+
+
+def test_complete_task_overdue(db_session, sample_user, sample_habit):
+    """Test that an overdue task is not completed."""
+    now = datetime.now()
+    task = Task(description="Yesterday", habit=sample_habit, start_date=now - timedelta(days=1), end_date=now - timedelta(hours=1))
+    db_session.add(task)
+    db_session.commit()
+
+    with pytest.raises(ValueError, match="Task is overdue and cannot be completed."):
+        TaskService(db_session).complete_task(sample_user.id, task.id)
+    assert task.completed is False
+    assert sample_habit.current_streak == 0
+
+
+def test_complete_task_out_of_order(db_session, sample_user, sample_habit):
+    """Test that completing an older open period after a newer one rebuilds the streaks."""
+    now = datetime.now()
+    older = sample_habit.add_task("Older", now - timedelta(hours=2), now + timedelta(hours=1))
+    newer = sample_habit.add_task("Newer", now - timedelta(hours=1), now + timedelta(hours=2))
+    db_session.commit()
+    task_service = TaskService(db_session)
+
+    task_service.complete_task(sample_user.id, newer.id)
+    task_service.complete_task(sample_user.id, older.id)
+
+    assert (sample_habit.current_streak, sample_habit.longest_streak) == (2, 2)
+    assert sample_habit.last_completed_period_end == newer.end_date
+
+
+def test_complete_tasks_reports_each_task(db_session, sample_user, sample_habit, sample_task):
+    """Test completing many tasks at once, with the reason every task that was not completed."""
+    now = datetime.now()
+    overdue = Task(description="Yesterday", habit=sample_habit, start_date=now - timedelta(days=1),
+                   end_date=now - timedelta(hours=1))
+    another_user = User(name="Another User", email="anotheruser@example.com")
+    another_user.set_password("password123")
+    db_session.add_all([overdue, another_user])
+    db_session.commit()
+    task_service = TaskService(db_session)
+
+    results = task_service.complete_tasks(sample_user.id, [sample_task.id, overdue.id, 9999])
+
+    assert results == {
+        sample_task.id: None,
+        overdue.id: "Task is overdue and cannot be completed.",
+        9999: "Task not found.",
+    }
+    assert sample_task.completed is True
+    assert sample_habit.current_streak == 1
+    assert task_service.complete_tasks(sample_user.id, [sample_task.id]) == {sample_task.id: "Task is already completed."}
+    assert task_service.complete_tasks(another_user.id, [overdue.id]) == {overdue.id: "Task does not belong to the user."}
+    assert sample_habit.current_streak == 1
+
+
+def test_list_tasks_keyset(db_session, sample_habit):
+    """Test paging through a habit's tasks with a limit, after an ID, since a date and in both orders."""
+    start = datetime(2024, 1, 1)
+    for day in range(5):
+        task = Task(description=f"Day {day}", habit=sample_habit, start_date=start + timedelta(days=day),
+                    end_date=start + timedelta(days=day, hours=23))
+        db_session.add(task)
+    db_session.commit()
+    task_service = TaskService(db_session)
+
+    tasks = list(task_service.list_tasks(sample_habit.id, batch_size=2))
+    assert [task.description for task in tasks] == [f"Day {day}" for day in range(5)]
+
+    page = list(task_service.list_tasks(sample_habit.id, limit=2, after_id=tasks[1].id))
+    assert [task.description for task in page] == ["Day 2", "Day 3"]
+
+    page = list(task_service.list_tasks(sample_habit.id, limit=2, after_id=tasks[3].id, descending=True))
+    assert [task.description for task in page] == ["Day 2", "Day 1"]
+
+    since = list(task_service.list_tasks(sample_habit.id, since=start + timedelta(days=3)))
+    assert [task.description for task in since] == ["Day 3", "Day 4"]
@@ -0,0 +1,90 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from app.services.util import compute_start_and_end_date
+from app.timezones import is_valid_timezone, local_midnight_buckets
+
+
+def test_local_midnight_buckets():
+    """Test that the timezones whose local day just started are grouped by their UTC offset."""
+    zones = ['UTC', 'Africa/Abidjan', 'Europe/London', 'Asia/Kolkata', 'Asia/Tokyo']
+
+    # 00:05 UTC is 01:05 in London in summer, 05:35 in Kolkata and 09:05 in Tokyo
+    assert local_midnight_buckets(zones, datetime(2024, 6, 1, 0, 5, tzinfo=timezone.utc)) == {
+        timedelta(0): ['UTC', 'Africa/Abidjan'],
+    }
+    # 00:05 in London in winter
+    assert local_midnight_buckets(zones, datetime(2024, 1, 1, 0, 5, tzinfo=timezone.utc)) == {
+        timedelta(0): ['UTC', 'Africa/Abidjan', 'Europe/London'],
+    }
+    # Half hour offsets have a bucket of their own
+    assert local_midnight_buckets(zones, datetime(2024, 6, 1, 18, 35, tzinfo=timezone.utc)) == {
+        timedelta(hours=5, minutes=30): ['Asia/Kolkata'],
+    }
+    assert local_midnight_buckets(zones, datetime(2024, 6, 1, 0, 20, tzinfo=timezone.utc)) == {}
+
+
+def test_local_midnight_buckets_since_previous_run():
+    """Test that a late run rolls over every timezone whose midnight passed since the previous run."""
+    zones = ['UTC', 'Europe/London', 'Asia/Kolkata', 'Asia/Tokyo']
+    since = datetime(2024, 5, 31, 22, 45, tzinfo=timezone.utc)
+
+    # Midnight in London was at 23:00 UTC, in UTC at 00:00, and the run due at 23:00 started at 00:10
+    assert local_midnight_buckets(zones, datetime(2024, 6, 1, 0, 10, tzinfo=timezone.utc), since) == {
+        timedelta(0): ['UTC'],
+        timedelta(hours=1): ['Europe/London'],
+    }
+    assert local_midnight_buckets(zones, datetime(2024, 5, 31, 23, 30, tzinfo=timezone.utc), since) == {
+        timedelta(hours=1): ['Europe/London'],
+    }
+
+
+def test_is_valid_timezone():
+    assert is_valid_timezone('Europe/Berlin')
+    assert is_valid_timezone('UTC')
+    assert not is_valid_timezone('Nope/Nowhere')
+    assert not is_valid_timezone('')
+    assert not is_valid_timezone('../etc/passwd')
+
+
+def test_compute_start_and_end_date_in_timezone():
+    """Test that the period follows the local calendar of the timezone and ends in host time."""
+    tokyo = ZoneInfo('Asia/Tokyo')
+    now = datetime(2024, 3, 31, 20, 0, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)  # April 1st in Tokyo
+    host = lambda local: local.replace(tzinfo=tokyo).astimezone().replace(tzinfo=None)
+
+    assert compute_start_and_end_date('daily', now, 'Asia/Tokyo') == (now, host(datetime(2024, 4, 1, 23, 59, 59, 999999)))
+    assert compute_start_and_end_date('monthly', now, 'Asia/Tokyo') == (now, host(datetime(2024, 4, 30, 23, 59, 59, 999999)))
+    assert compute_start_and_end_date('daily', now) == compute_start_and_end_date('daily', now, None)
+
+
+def test_set_timezone(user_service, sample_user):
+    user_service.set_timezone(sample_user, 'Europe/Berlin')
+    assert user_service.get_user_by_id(sample_user.id).timezone == 'Europe/Berlin'
+
+    with pytest.raises(ValueError, match="Invalid timezone."):
+        user_service.set_timezone(sample_user, 'Europe/Nowhere')
+
+
+def test_add_tasks_for_due_habits_of_timezones(habit_service, user_service, db_session, sample_user):
+    """Test that a timezone rollover only adds the tasks of the habits of its users, with their local periods."""
+    tokyo_user = user_service.register("Tokyo User", "tokyo@example.com", "pasSword@123")
+    user_service.set_timezone(tokyo_user, 'Asia/Tokyo')
+    host_habit = habit_service.create_habit(user=sample_user, name="Exercise", periodicity="daily")
+    tokyo_habit = habit_service.create_habit(user=tokyo_user, name="Reading", periodicity="daily")
+    for habit in [host_habit, tokyo_habit]:
+        habit.get_tasks()[0].end_date = datetime.now() - timedelta(days=1)
+    db_session.commit()
+
+    now = datetime.now()
+    created = habit_service.add_tasks_for_due_habits(chunk_size=10, now=now, timezones=['Asia/Tokyo'])
+    db_session.expire_all()
+
+    assert created == 1
+    assert host_habit.count_tasks() == 1
+    assert tokyo_habit.get_tasks()[1].end_date == compute_start_and_end_date('daily', now, 'Asia/Tokyo')[1]
+
+    # The users without a timezone are rolled over by default
+    assert habit_service.add_tasks_for_due_habits(chunk_size=10, now=now) == 1
+    db_session.expire_all()
+    assert host_habit.count_tasks() == 2
@@ -1,4 +1,10 @@
 import pytest
+import jsonwebtoken as jwt
+from datetime import datetime, timedelta, timezone
+from app.config import config
+from app.services import user_service as user_service_module
+from app.services.token_cache import TokenCache
+from app.services.user_import import read_user_records
 
 # Test UserService register method
 def test_register(user_service, db_session):
@@ -81,3 +87,130 @@ def test_get_user_by_id(user_service, sample_user):
     user = user_service.get_user_by_id(sample_user.id)
     assert user is not None
     assert user.id == sample_user.id
+
+
+# Test UserService get_auth_token claims
+def test_get_auth_token_claims(user_service, sample_user):
+    """Test that the token carries the user id and an expiry."""
+    token = user_service.get_auth_token(sample_user.email)
+    payload = jwt.decode(token, config.SECRET_KEY, algorithms=[user_service_module.ALGORITHM])
+
+    assert payload["user_id"] == sample_user.id
+    assert payload["exp"] > datetime.now(timezone.utc).timestamp()
+
+
+# Test UserService get_user_from_token uses the token cache
+def test_get_user_from_token_cached(user_service, sample_user, monkeypatch):
+    """Test that a cached token is resolved without decoding it again."""
+    token = user_service.get_auth_token(sample_user.email, sample_user.id)
+    assert user_service.get_user_from_token(token).id == sample_user.id
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError("token should not be decoded again")
+
+    monkeypatch.setattr(user_service_module.jwt, "decode", fail_decode)
+    assert user_service.get_user_from_token(token).id == sample_user.id
+
+
+# Test UserService get_user_from_token with an expired token
+def test_get_user_from_token_expired(user_service, sample_user):
+    """Test that an expired token is rejected."""
+    payload = {"email": sample_user.email, "user_id": sample_user.id, "exp": datetime.now(timezone.utc) - timedelta(minutes=1)}
+    token = jwt.encode(payload, config.SECRET_KEY, algorithm=user_service_module.ALGORITHM)
+
+    assert user_service.get_user_from_token(token) is None
+
+
+# Test UserService update_password invalidates cached tokens
+def test_update_password_invalidates_token_cache(user_service, sample_user):
+    """Test that updating a user drops their cached tokens."""
+    token = user_service.get_auth_token(sample_user.email, sample_user.id)
+    user_service.get_user_from_token(token)
+    assert user_service_module.token_cache.get(token) is not None
+
+    user_service.update_password(sample_user.email, "pasSword@123", "newpassword123")
+
+    assert user_service_module.token_cache.get(token) is None
+
+
+# Test TokenCache bounds and expiry
+def test_token_cache_lru_and_ttl():
+    """Test that the cache evicts the least recently used token and expires entries."""
+    cache = TokenCache(max_size=2, ttl=60)
+    cache.set("a", {"email": "a@example.com"}, 1)
+    cache.set("b", {"email": "b@example.com"}, 2)
+    cache.get("a")
+    cache.set("c", {"email": "c@example.com"}, 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == ({"email": "a@example.com"}, 1)
+    assert len(cache) == 2
+
+    cache.set("d", {"email": "d@example.com", "exp": 0}, 4)
+    assert cache.get("d") is None
+
+
+# Test UserService import_users method
+def test_import_users(user_service, sample_user, tmp_path):
+    """Test that users are imported in bulk and failing rows are reported."""
+    path = tmp_path / "users.jsonl"
+    path.write_text(
+        '{"name": "One", "email": "One@example.com", "password": "pasSword@123"}\n'
+        '{"name": "Two", "email": "two@example.com", "password": "pasSword@123"}\n'
+        '{"name": "Again", "email": "one@example.com", "password": "pasSword@123"}\n'
+        '{"name": "Test", "email": "testuser@example.com", "password": "pasSword@123"}\n'
+    )
+
+    result = user_service.import_users(read_user_records(str(path)), batch_size=1, workers=2)
+
+    assert result.created == 2
+    assert [(line, email) for line, email, _ in result.failures] == [(3, "one@example.com"), (4, "testuser@example.com")]
+    assert user_service.login("one@example.com", "pasSword@123") is not None
+
+
+# Test that malformed JSONL lines are reported without aborting the import
+def test_import_users_invalid_json(user_service, tmp_path):
+    """Test that a line that is not a JSON object fails on its own and the other rows are imported."""
+    path = tmp_path / "users.jsonl"
+    path.write_text(
+        '{"name": "One", "email": "one@example.com", "password": "pasSword@123"}\n'
+        '{"name": "Broken", "email": \n'
+        '[1, 2]\n'
+        '{"name": "Two", "email": "two@example.com", "password": "pasSword@123"}\n'
+    )
+
+    result = user_service.import_users(read_user_records(str(path)), workers=1)
+
+    assert result.created == 2
+    assert result.failures == [(2, "", "Invalid JSON record."), (3, "", "Invalid JSON record.")]
+    assert user_service.login("two@example.com", "pasSword@123") is not None
+
+
+# Test that the import validates records like a registration
+def test_import_users_invalid_records(user_service):
+    """Test that records with an empty name, a malformed email or a weak password are reported, not inserted."""
+    records = [
+        (2, {"name": " ", "email": "blank@example.com", "password": "pasSword@123"}),
+        (3, {"name": "Bad", "email": "not-an-email", "password": "pasSword@123"}),
+        (4, {"name": "Weak", "email": "weak@example.com", "password": "password"}),
+        (5, {"name": "Good", "email": "good@example.com", "password": "pasSword@123"}),
+    ]
+
+    result = user_service.import_users(records, workers=1)
+
+    assert result.created == 1
+    assert result.failures == [
+        (2, "blank@example.com", "Name cannot be empty."),
+        (3, "not-an-email", "Invalid email format."),
+        (4, "weak@example.com", "Password does not meet the requirements."),
+    ]
+    assert user_service.get_user("blank@example.com") is None
+
+
+# Test CSV parsing for the user import
+def test_read_user_records_csv(tmp_path):
+    """Test that CSV rows are read with their line numbers."""
+    path = tmp_path / "users.csv"
+    path.write_text("name,email,password\nOne,one@example.com,pasSword@123\n")
+
+    assert list(read_user_records(str(path))) == [(2, {"name": "One", "email": "one@example.com", "password": "pasSword@123"})]
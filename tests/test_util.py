@@ -12,7 +12,7 @@ def test_compute_start_and_end_date_daily():
     assert end_date.hour == 23
     assert end_date.minute == 59
     assert end_date.second == 59
-    assert end_date.microsecond == 999
+    assert end_date.microsecond == 999999
 
 def test_compute_start_and_end_date_weekly():
     # Testing weekly periodicity
@@ -46,8 +46,8 @@ def test_compute_start_and_end_date_quarterly():
     # Testing quarterly periodicity
     start_date, end_date = compute_start_and_end_date('quarterly')
     today = datetime.now()
-    quarter_start_month = ((today.month - 1) // 3) * 3 + 1
-    expected_end_date = today.replace(month=quarter_start_month, day=1, hour=0, minute=0, second=0, microsecond=0) + timedelta(days=90) - timedelta(seconds=1)
+    quarter_end_month = ((today.month - 1) // 3) * 3 + 3
+    expected_end_date = (today.replace(month=quarter_end_month, day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
 
     assert start_date.month == today.month
     assert end_date.date() == expected_end_date.date()
@@ -56,8 +56,7 @@ def test_compute_start_and_end_date_biannually():
     # Testing biannually periodicity
     start_date, end_date = compute_start_and_end_date('biannually')
     today = datetime.now()
-    half_year_start = today.replace(month=1 if today.month <= 6 else 7, day=1, hour=0, minute=0, second=0, microsecond=0)
-    expected_end_date = half_year_start + timedelta(days=181) - timedelta(seconds=1)
+    expected_end_date = today.replace(month=6, day=30) if today.month <= 6 else today.replace(month=12, day=31)
 
     assert start_date.month == today.month
     assert end_date.date() == expected_end_date.date()
@@ -74,48 +73,40 @@ def test_compute_start_and_end_date_yearly():
 # Test get_last_interval_for_periodicity function
 def test_get_last_interval_for_periodicity_daily():
     # Testing the last daily interval
-    start_date = datetime(2024, 1, 1)
-    end_date = datetime(2024, 1, 1)
-    last_start_date, last_end_date = get_last_interval_for_periodicity('daily', start_date, end_date)
-    
-    expected_last_start_date = start_date - timedelta(days=1)
-    expected_last_end_date = end_date - timedelta(days=1)
-    
-    assert last_start_date == expected_last_start_date
-    assert last_end_date == expected_last_end_date
+    start_date = datetime(2024, 1, 1, 10)
+    last_start_date, last_end_date = get_last_interval_for_periodicity('daily', start_date)
+
+    assert last_start_date == datetime(2023, 12, 31)
+    assert last_end_date == datetime(2023, 12, 31, 23, 59, 59, 999999)
 
 def test_get_last_interval_for_periodicity_weekly():
-    # Testing the last weekly interval
-    start_date = datetime(2024, 1, 1)
-    end_date = datetime(2024, 1, 7)
-    last_start_date, last_end_date = get_last_interval_for_periodicity('weekly', start_date, end_date)
-    
-    expected_last_start_date = start_date - timedelta(weeks=1)
-    expected_last_end_date = end_date - timedelta(weeks=1)
-    
-    assert last_start_date == expected_last_start_date
-    assert last_end_date == expected_last_end_date
+    # Testing the last weekly interval, the 7 days before the current one
+    start_date = datetime(2024, 1, 1, 10)
+    last_start_date, last_end_date = get_last_interval_for_periodicity('weekly', start_date)
+
+    assert last_start_date == datetime(2023, 12, 25)
+    assert last_end_date == datetime(2023, 12, 31, 23, 59, 59, 999999)
 
 def test_get_last_interval_for_periodicity_monthly():
-    # Testing the last monthly interval
-    start_date = datetime(2024, 1, 1)
-    end_date = datetime(2024, 1, 31)
-    last_start_date, last_end_date = get_last_interval_for_periodicity('monthly', start_date, end_date)
-    
-    expected_last_start_date = start_date - timedelta(days=30)
-    expected_last_end_date = end_date - timedelta(days=30)
-    
-    assert last_start_date == expected_last_start_date
-    assert last_end_date == expected_last_end_date
+    # Testing the last monthly interval, the previous calendar month
+    start_date = datetime(2024, 3, 15)
+    last_start_date, last_end_date = get_last_interval_for_periodicity('monthly', start_date)
+
+    assert last_start_date == datetime(2024, 2, 1)
+    assert last_end_date == datetime(2024, 2, 29, 23, 59, 59, 999999)
+
+def test_get_last_interval_for_periodicity_quarterly():
+    # Testing the last quarterly interval, the previous calendar quarter
+    start_date = datetime(2024, 2, 10)
+    last_start_date, last_end_date = get_last_interval_for_periodicity('quarterly', start_date)
+
+    assert last_start_date == datetime(2023, 10, 1)
+    assert last_end_date == datetime(2023, 12, 31, 23, 59, 59, 999999)
 
 def test_get_last_interval_for_periodicity_yearly():
     # Testing the last yearly interval
     start_date = datetime(2024, 1, 1)
-    end_date = datetime(2024, 12, 31)
-    last_start_date, last_end_date = get_last_interval_for_periodicity('yearly', start_date, end_date)
-    
-    expected_last_start_date = start_date - timedelta(days=365)
-    expected_last_end_date = end_date - timedelta(days=365)
-    
-    assert last_start_date == expected_last_start_date
-    assert last_end_date == expected_last_end_date
+    last_start_date, last_end_date = get_last_interval_for_periodicity('yearly', start_date)
+
+    assert last_start_date == datetime(2023, 1, 1)
+    assert last_end_date == datetime(2023, 12, 31, 23, 59, 59, 999999)